@@ -0,0 +1,26 @@
+"""
+Two-stage confidence-gated classifier.
+
+A small, fast model answers first; only images it is unsure about (confidence
+below `threshold`) are escalated to the full model. Every result carries a
+`stage` key ("fast" or "full") saying which model answered.
+"""
+
+
+class Cascade:
+    def __init__(self, fast, full, threshold):
+        self.fast = fast
+        self.full = full
+        self.threshold = threshold
+
+    def predict_batch(self, image_paths):
+        results = [dict(r, stage="fast") for r in self.fast.predict_batch(image_paths)]
+        unsure = [i for i, r in enumerate(results) if r["confidence"] < self.threshold]
+        if unsure:
+            escalated = self.full.predict_batch([image_paths[i] for i in unsure])
+            for i, result in zip(unsure, escalated):
+                results[i] = dict(result, stage="full")
+        return results
+
+    def predict(self, image_path):
+        return self.predict_batch([image_path])[0]
@@ -0,0 +1,26 @@
+import os
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+MODELS_DIR = os.path.join(os.path.dirname(BASE_DIR), "instance", "models")
+
+MODEL_NAME = os.environ.get("MODEL_NAME", "microsoft/resnet-50")
+
+# "torch" (transformers, eager) or "onnx" (onnxruntime on CPU, see ai/export_onnx.py)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch").lower()
+ONNX_MODEL_PATH = os.environ.get("ONNX_MODEL_PATH", os.path.join(MODELS_DIR, "resnet-50.onnx"))
+ONNX_NUM_THREADS = int(os.environ.get("ONNX_NUM_THREADS", 0)) or None
+
+# Optional cascade: a small model answers first and only predictions below
+# CASCADE_THRESHOLD confidence are escalated to MODEL_NAME. Disabled when empty.
+CASCADE_FAST_MODEL_NAME = os.environ.get("CASCADE_FAST_MODEL_NAME", "")
+CASCADE_FAST_ONNX_MODEL_PATH = os.environ.get(
+    "CASCADE_FAST_ONNX_MODEL_PATH", os.path.join(MODELS_DIR, "mobilenet_v2.onnx")
+)
+CASCADE_THRESHOLD = float(os.environ.get("CASCADE_THRESHOLD", 0.6))
+
+# Out-of-process inference (see ai/inference_server.py). When set, predict()
+# sends images to the service over this Unix socket; in-process otherwise.
+INFERENCE_SOCKET_PATH = os.environ.get("INFERENCE_SOCKET_PATH", "")
+INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", 10))
+# Fall back to loading the model in-process when the service is unreachable
+INFERENCE_FALLBACK = os.environ.get("INFERENCE_FALLBACK", "true").lower() == "true"
@@ -1,22 +1,123 @@
-from transformers import AutoProcessor, AutoModelForImageClassification
-from PIL import Image
-import torch
+import io
+import logging
+import threading
+
+from ai.config import (
+    MODEL_NAME,
+    INFERENCE_BACKEND,
+    ONNX_MODEL_PATH,
+    ONNX_NUM_THREADS,
+    CASCADE_FAST_MODEL_NAME,
+    CASCADE_FAST_ONNX_MODEL_PATH,
+    CASCADE_THRESHOLD,
+    INFERENCE_SOCKET_PATH,
+    INFERENCE_TIMEOUT,
+    INFERENCE_FALLBACK,
+)
+
+logger = logging.getLogger(__name__)
 
 # 🔧 Change this:
 # model_name = "belab/waste-classification"
 # To this:
-model_name = "microsoft/resnet-50"
+model_name = MODEL_NAME
+
+
+def load_classifier(name, onnx_path):
+    if INFERENCE_BACKEND == "onnx":
+        # ONNX Runtime on CPU: no torch/transformers import at serve time
+        from ai.onnx_backend import OnnxClassifier
+        return OnnxClassifier(onnx_path, num_threads=ONNX_NUM_THREADS)
+
+    from ai.torch_backend import TorchClassifier
+    return TorchClassifier(name)
+
+
+def build_classifier():
+    classifier = load_classifier(model_name, ONNX_MODEL_PATH)
+    if CASCADE_FAST_MODEL_NAME:
+        from ai.cascade import Cascade
+
+        classifier = Cascade(
+            load_classifier(CASCADE_FAST_MODEL_NAME, CASCADE_FAST_ONNX_MODEL_PATH),
+            classifier,
+            CASCADE_THRESHOLD,
+        )
+    return classifier
+
+
+_classifier_lock = threading.Lock()
+_warm = False  # set once any inference (or warmup()) has completed
+
+# Built on first use by get_classifier(), so importing this module (e.g. for
+# load_classifier) never loads a model.
+classifier = None
+
+if INFERENCE_SOCKET_PATH:
+    # Model lives in ai.inference_server; only load it here on fallback
+    from ai.inference_client import InferenceClient, ServiceUnreachable
+
+    client = InferenceClient(INFERENCE_SOCKET_PATH, timeout=INFERENCE_TIMEOUT)
+else:
+    client = None
+
+
+def get_classifier():
+    global classifier
+    if classifier is None:
+        with _classifier_lock:
+            if classifier is None:
+                classifier = build_classifier()
+    return classifier
+
+
+def _with_stage(result):
+    return dict({"stage": "full"}, **result)
+
+
+def predict_batch(image_paths):
+    global _warm
+    if client is not None:
+        try:
+            results = [_with_stage(client.predict(path)) for path in image_paths]
+            _warm = True
+            return results
+        except ServiceUnreachable as e:
+            # Only when nothing is listening: a timeout means the service is up
+            # but busy, and loading another model copy here would make it worse.
+            if not INFERENCE_FALLBACK:
+                raise
+            logger.warning(f"Inference service unreachable, running in-process: {e}")
+    results = [_with_stage(r) for r in get_classifier().predict_batch(image_paths)]
+    _warm = True
+    return results
 
-# Load pretrained model + processor
-processor = AutoProcessor.from_pretrained(model_name)
-model = AutoModelForImageClassification.from_pretrained(model_name)
 
 def predict(image_path):
-    image = Image.open(image_path).convert("RGB")
-    inputs = processor(images=image, return_tensors="pt")
-    outputs = model(**inputs)
-    logits = outputs.logits
-    predicted_class_idx = logits.argmax(-1).item()
-    label = model.config.id2label[predicted_class_idx]
-    confidence = torch.softmax(logits, dim=-1)[0][predicted_class_idx].item()
-    return {"category": label, "confidence": confidence}
+    return predict_batch([image_path])[0]
+
+
+def warmup():
+    """
+    Run one throwaway inference so the first real request does not pay for lazy init.
+
+    With the inference service configured this only checks the service; it never
+    loads a model in the web worker, so a service that starts after the app
+    just leaves the worker not-ready until it answers.
+    """
+    global _warm
+    from PIL import Image
+
+    image = Image.new("RGB", (256, 256))
+    if client is not None:
+        buf = io.BytesIO()
+        image.save(buf, format="PNG")
+        client.predict_bytes(buf.getvalue())
+        _warm = True
+        return
+    get_classifier().predict(image)
+    _warm = True
+
+
+def is_warm():
+    return _warm
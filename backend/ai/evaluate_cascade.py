@@ -0,0 +1,104 @@
+"""
+Offline accuracy/latency report for the fast -> full model cascade.
+
+Usage (from backend/):
+    python -m ai.evaluate_cascade <labelled folder> [--thresholds 0.3,0.4,...]
+
+With INFERENCE_BACKEND=onnx the models are the exported graphs given by
+--fast-onnx/--full-onnx (see `python -m ai.export_onnx`); --fast-model and
+--full-model only apply to the torch backend.
+
+The folder holds one sub-directory per label (e.g. `water bottle/`, `tin can/`);
+a prediction counts as correct when the directory name matches the predicted
+label or one of its comma-separated aliases. Both models run on every image
+once, and each threshold is then scored from those results.
+"""
+import argparse
+import time
+from pathlib import Path
+
+from ai.config import (
+    MODEL_NAME,
+    INFERENCE_BACKEND,
+    ONNX_MODEL_PATH,
+    CASCADE_FAST_MODEL_NAME,
+    CASCADE_FAST_ONNX_MODEL_PATH,
+)
+from ai.create_model import load_classifier
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".gif"}
+DEFAULT_THRESHOLDS = "0.3,0.4,0.5,0.6,0.7,0.8,0.9"
+DEFAULT_FAST_MODEL = "google/mobilenet_v2_1.0_224"
+
+
+def _is_correct(expected, category):
+    aliases = {a.strip().lower() for a in category.split(",")}
+    return expected.lower() in aliases
+
+
+def _timed(classifier, path):
+    start = time.perf_counter()
+    result = classifier.predict(path)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def evaluate(folder, fast, full, thresholds):
+    samples = [
+        (str(path), path.parent.name)
+        for path in sorted(Path(folder).glob("*/*"))
+        if path.suffix.lower() in IMAGE_SUFFIXES
+    ]
+    if not samples:
+        raise SystemExit(f"No labelled images found under {folder}")
+
+    # Warm both models so the first sample's timing is not skewed
+    fast.predict(samples[0][0])
+    full.predict(samples[0][0])
+
+    runs = []
+    for path, label in samples:
+        fast_result, fast_ms = _timed(fast, path)
+        full_result, full_ms = _timed(full, path)
+        runs.append((label, fast_result, fast_ms, full_result, full_ms))
+
+    n = len(runs)
+    print(f"{n} images")
+    print(f"{'threshold':>10} {'accuracy':>9} {'escalated':>10} {'mean ms':>8} {'vs full':>8}")
+    full_acc = sum(_is_correct(run[0], run[3]["category"]) for run in runs) / n
+    full_ms = sum(run[4] for run in runs) / n
+    for t in thresholds:
+        correct = escalated = 0
+        total_ms = 0.0
+        for label, fast_result, fast_ms, full_result, run_full_ms in runs:
+            total_ms += fast_ms
+            if fast_result["confidence"] < t:
+                escalated += 1
+                total_ms += run_full_ms
+                correct += _is_correct(label, full_result["category"])
+            else:
+                correct += _is_correct(label, fast_result["category"])
+        mean_ms = total_ms / n
+        print(f"{t:>10.2f} {correct / n:>9.1%} {escalated / n:>10.1%} {mean_ms:>8.1f} {mean_ms / full_ms:>8.0%}")
+    print(f"{'full only':>10} {full_acc:>9.1%} {'100.0%':>10} {full_ms:>8.1f} {'100%':>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder")
+    parser.add_argument("--fast-model", help=f"HuggingFace id (torch backend, default {CASCADE_FAST_MODEL_NAME or DEFAULT_FAST_MODEL})")
+    parser.add_argument("--full-model", help=f"HuggingFace id (torch backend, default {MODEL_NAME})")
+    parser.add_argument("--fast-onnx", default=CASCADE_FAST_ONNX_MODEL_PATH, help="Exported fast model (onnx backend)")
+    parser.add_argument("--full-onnx", default=ONNX_MODEL_PATH, help="Exported full model (onnx backend)")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS)
+    args = parser.parse_args()
+    if INFERENCE_BACKEND == "onnx" and (args.fast_model or args.full_model):
+        parser.error("--fast-model/--full-model select torch models; with INFERENCE_BACKEND=onnx use --fast-onnx/--full-onnx")
+
+    fast = load_classifier(args.fast_model or CASCADE_FAST_MODEL_NAME or DEFAULT_FAST_MODEL, args.fast_onnx)
+    full = load_classifier(args.full_model or MODEL_NAME, args.full_onnx)
+    thresholds = [float(t) for t in args.thresholds.split(",") if t.strip()]
+    evaluate(args.folder, fast, full, thresholds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Export the HuggingFace classifier to ONNX for the onnxruntime backend.
+
+Usage (from backend/):
+    python -m ai.export_onnx [--model microsoft/resnet-50] [--output instance/models/resnet-50.onnx]
+
+Writes the .onnx graph plus a sidecar .json with the label map and
+preprocessing settings, so serving needs neither torch nor transformers.
+"""
+import argparse
+import inspect
+import json
+import os
+
+import torch
+from transformers import AutoProcessor, AutoModelForImageClassification
+
+from ai.config import MODEL_NAME as DEFAULT_MODEL, ONNX_MODEL_PATH
+from ai.onnx_backend import metadata_path
+from ai.preprocess import config_from_processor
+
+
+class _LogitsOnly(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
+
+def export(model_id, output, opset=17):
+    processor = AutoProcessor.from_pretrained(model_id)
+    model = AutoModelForImageClassification.from_pretrained(model_id).eval()
+    preprocess = config_from_processor(processor)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    dummy = torch.zeros(1, 3, preprocess["size"], preprocess["size"])
+    # torch >= 2.9 defaults to the dynamo exporter, which needs onnxscript and
+    # ignores dynamic_axes; keep the TorchScript exporter this graph is built for.
+    legacy = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model),
+            dummy,
+            output,
+            input_names=["pixel_values"],
+            output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=opset,
+            **legacy,
+        )
+
+    with open(metadata_path(output), "w") as fh:
+        json.dump({
+            "model_name": model_id,
+            "id2label": {str(k): v for k, v in model.config.id2label.items()},
+            "preprocess": preprocess,
+        }, fh, indent=2)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="HuggingFace model id")
+    parser.add_argument("--output", default=ONNX_MODEL_PATH, help="Path of the .onnx file to write")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    path = export(args.model, args.output, args.opset)
+    print(f"Exported {args.model} to {path}")
+
+
+if __name__ == "__main__":
+    main()
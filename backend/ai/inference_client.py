@@ -0,0 +1,71 @@
+"""Thin client for ai.inference_server with per-thread connection reuse."""
+import socket
+import threading
+
+from ai.inference_protocol import STATUS_OK, recv_response, send_request
+
+
+class InferenceUnavailable(Exception):
+    """The inference service could not be reached or did not answer in time."""
+
+
+class ServiceUnreachable(InferenceUnavailable):
+    """Nothing is listening on the socket (service down or not started yet)."""
+
+
+class InferenceTimeout(InferenceUnavailable):
+    """The service accepted the request but did not answer in time (overloaded)."""
+
+
+class InferenceClient:
+    def __init__(self, socket_path, timeout=10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise ServiceUnreachable(f"cannot connect to {self.socket_path}: {e}") from e
+        self._local.sock = sock
+        return sock
+
+    def close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _roundtrip(self, image_bytes):
+        sock = getattr(self._local, "sock", None) or self._connect()
+        send_request(sock, image_bytes)
+        return recv_response(sock)
+
+    def predict(self, image_path):
+        with open(image_path, "rb") as fh:
+            return self.predict_bytes(fh.read())
+
+    def predict_bytes(self, image_bytes):
+        for attempt in range(2):
+            try:
+                status, body = self._roundtrip(image_bytes)
+                break
+            except socket.timeout as e:
+                # The service may still be busy with this frame; never reuse the connection.
+                self.close()
+                raise InferenceTimeout(f"inference timed out after {self.timeout}s") from e
+            except ServiceUnreachable:
+                raise
+            except (ConnectionError, OSError) as e:
+                # A pooled connection may have been closed by a restarted server; retry once fresh.
+                self.close()
+                if attempt:
+                    raise InferenceUnavailable(str(e)) from e
+
+        if status != STATUS_OK:
+            raise RuntimeError(body.get("error", "inference failed"))
+        return body
@@ -0,0 +1,62 @@
+"""
+Binary framing for the out-of-process inference service.
+
+Request:  b"ECO1" | uint32 payload length | raw image bytes
+Response: uint8 status (0 = ok, 1 = error) | uint32 length | UTF-8 JSON body
+All integers are big-endian. A connection carries any number of request /
+response pairs, so clients keep it open between predictions.
+"""
+import json
+import struct
+
+MAGIC = b"ECO1"
+REQUEST_HEADER = struct.Struct("!4sI")
+RESPONSE_HEADER = struct.Struct("!BI")
+STATUS_OK = 0
+STATUS_ERROR = 1
+MAX_PAYLOAD = 32 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def recv_exact(sock, size):
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed mid-frame")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_request(sock, image_bytes):
+    sock.sendall(REQUEST_HEADER.pack(MAGIC, len(image_bytes)) + image_bytes)
+
+
+def recv_request(sock):
+    """Image bytes of the next request, or None when the client hung up cleanly."""
+    header = sock.recv(REQUEST_HEADER.size, 0)
+    if not header:
+        return None
+    if len(header) < REQUEST_HEADER.size:
+        header += recv_exact(sock, REQUEST_HEADER.size - len(header))
+    magic, length = REQUEST_HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ProtocolError("bad magic")
+    if length > MAX_PAYLOAD:
+        raise ProtocolError(f"payload too large ({length} bytes)")
+    return recv_exact(sock, length)
+
+
+def send_response(sock, status, body):
+    data = json.dumps(body).encode("utf-8")
+    sock.sendall(RESPONSE_HEADER.pack(status, len(data)) + data)
+
+
+def recv_response(sock):
+    status, length = RESPONSE_HEADER.unpack(recv_exact(sock, RESPONSE_HEADER.size))
+    return status, json.loads(recv_exact(sock, length))
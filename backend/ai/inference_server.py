@@ -0,0 +1,152 @@
+"""
+Out-of-process inference service reached over a Unix domain socket.
+
+Usage (from backend/, alongside the web app):
+    python -m ai.inference_server [--socket instance/inference.sock] [--workers 2]
+
+The listening socket is bound once and shared by `--workers` forked
+processes; each loads the classifier and serves many client connections,
+running one inference at a time. A worker that dies is restarted (after a
+short backoff if it crashed soon after starting). Web workers talk to it
+through ai.inference_client, so model memory no longer scales with web
+concurrency.
+"""
+import argparse
+import io
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+from PIL import Image
+
+from ai.config import INFERENCE_SOCKET_PATH
+from ai.inference_protocol import (
+    ProtocolError,
+    STATUS_ERROR,
+    STATUS_OK,
+    recv_request,
+    send_response,
+)
+
+logger = logging.getLogger("ai.inference_server")
+
+RESTART_BACKOFF_SECONDS = 5.0
+
+
+def _serve_connection(conn, classifier, inference_lock):
+    with conn:
+        while True:
+            try:
+                payload = recv_request(conn)
+            except (ConnectionError, ProtocolError) as e:
+                logger.warning(f"Dropping client connection: {e}")
+                return
+            if payload is None:
+                return
+            try:
+                image = Image.open(io.BytesIO(payload))
+                with inference_lock:
+                    result = classifier.predict(image)
+                send_response(conn, STATUS_OK, result)
+            except OSError as e:
+                logger.warning(f"Client went away: {e}")
+                return
+            except Exception as e:
+                logger.exception("Inference failed")
+                try:
+                    send_response(conn, STATUS_ERROR, {"error": str(e)})
+                except OSError:
+                    return
+
+
+def _worker_loop(listener):
+    from ai.create_model import get_classifier
+
+    classifier = get_classifier()
+    inference_lock = threading.Lock()
+    logger.info(f"Inference worker {os.getpid()} ready")
+    while True:
+        conn, _ = listener.accept()
+        threading.Thread(
+            target=_serve_connection, args=(conn, classifier, inference_lock), daemon=True
+        ).start()
+
+
+def serve(socket_path, workers=1):
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+    logger.info(f"Inference service listening on {socket_path} with {workers} worker(s)")
+
+    if workers <= 1:
+        _worker_loop(listener)
+        return
+
+    children = {}  # pid -> start time
+    stopping = threading.Event()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                _worker_loop(listener)
+            finally:
+                os._exit(1)
+        children[pid] = time.monotonic()
+
+    def _stop(signum, frame):
+        stopping.set()
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = children.pop(pid, None)
+            if started is None or stopping.is_set():
+                continue
+            logger.error(
+                f"Inference worker {pid} exited with code {os.waitstatus_to_exitcode(status)}; "
+                f"restarting ({len(children)}/{workers} running)"
+            )
+            if time.monotonic() - started < RESTART_BACKOFF_SECONDS:
+                time.sleep(RESTART_BACKOFF_SECONDS)  # crash loop: don't spin
+            if not stopping.is_set():
+                spawn()
+    finally:
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=INFERENCE_SOCKET_PATH or os.path.join("instance", "inference.sock"))
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(args.socket, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""ONNX Runtime (CPU) serving backend for the exported classifier."""
+import json
+import os
+
+import numpy as np
+import onnxruntime as ort
+
+from ai.preprocess import DEFAULT_CONFIG, BatchPreprocessor
+
+
+def metadata_path(model_path):
+    return os.path.splitext(model_path)[0] + ".json"
+
+
+class OnnxClassifier:
+    def __init__(self, model_path, num_threads=None):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"ONNX model not found at {model_path}; run `python -m ai.export_onnx` first"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+        with open(metadata_path(model_path)) as fh:
+            meta = json.load(fh)
+        self.id2label = {int(k): v for k, v in meta["id2label"].items()}
+        self.preprocess = BatchPreprocessor(**{**DEFAULT_CONFIG, **meta.get("preprocess", {})})
+
+    def predict_logits(self, pixel_values):
+        return self.session.run(None, {self.input_name: pixel_values})[0]
+
+    def predict_batch(self, image_paths):
+        logits = self.predict_logits(self.preprocess(image_paths))
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        probs = exp / exp.sum(axis=-1, keepdims=True)
+        indices = probs.argmax(axis=-1)
+        return [
+            {"category": self.id2label[int(idx)], "confidence": float(row[idx])}
+            for idx, row in zip(indices, probs)
+        ]
+
+    def predict(self, image_path):
+        return self.predict_batch([image_path])[0]
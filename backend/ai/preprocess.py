@@ -0,0 +1,152 @@
+"""
+NumPy reimplementation of the ResNet-50 image processor.
+
+Mirrors what transformers' ConvNext-style processor does for
+`microsoft/resnet-50`: resize the shortest edge to size / crop_pct, center-crop
+to size x size, rescale to [0, 1] and normalize with the ImageNet mean/std.
+Only Pillow and NumPy are needed, so serving does not import torch/transformers.
+
+Resizing stays in Pillow (C); everything after it runs as one vectorized pass
+over the whole batch, written into a preallocated contiguous float32 buffer
+that is reused across calls.
+
+Check parity with the HuggingFace processor (from backend/):
+    python -m ai.preprocess validate <image folder> [--model microsoft/resnet-50]
+"""
+import threading
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_CONFIG = {
+    "size": 224,
+    "crop_pct": 0.875,
+    "resample": Image.BICUBIC,
+    "image_mean": [0.485, 0.456, 0.406],
+    "image_std": [0.229, 0.224, 0.225],
+}
+
+
+def config_from_processor(processor):
+    """Extract the settings BatchPreprocessor needs from a HuggingFace image processor."""
+    # Sizes are plain dicts in transformers 4 and SizeDict objects in 5; both have .get()
+    size = processor.size
+    if not isinstance(size, int):
+        size = size.get("shortest_edge") or size.get("height")
+    crop_pct = getattr(processor, "crop_pct", None) or 0.875
+    crop_size = getattr(processor, "crop_size", None)
+    if crop_size is not None and not isinstance(crop_size, int) and getattr(processor, "do_center_crop", True):
+        # Processors such as MobileNetV2 resize to `size` then crop to `crop_size`
+        crop_pct = crop_size.get("height") / size
+        size = crop_size.get("height")
+    return {
+        "size": int(size),
+        "crop_pct": float(crop_pct),
+        "resample": int(processor.resample),
+        "image_mean": list(processor.image_mean),
+        "image_std": list(processor.image_std),
+    }
+
+
+def _resize_shortest_edge(image, shortest_edge, resample):
+    width, height = image.size
+    if width <= height:
+        new_size = (shortest_edge, int(shortest_edge * height / width))
+    else:
+        new_size = (int(shortest_edge * width / height), shortest_edge)
+    return image.resize(new_size, resample)
+
+
+class BatchPreprocessor:
+    """
+    Turns a batch of images into an (n, 3, size, size) float32 array.
+
+    The returned array is a view into a per-thread buffer that is overwritten
+    by the next call on the same thread; copy it if it must outlive that.
+    """
+
+    def __init__(self, size=224, crop_pct=0.875, resample=Image.BICUBIC, image_mean=None, image_std=None, capacity=1):
+        self.size = size
+        self.crop_pct = crop_pct
+        self.resample = resample
+        self.capacity = capacity
+        mean = np.asarray(image_mean or DEFAULT_CONFIG["image_mean"], dtype=np.float32)
+        std = np.asarray(image_std or DEFAULT_CONFIG["image_std"], dtype=np.float32)
+        # (x / 255 - mean) / std  ==  x * scale - shift, computed per channel
+        self._scale = (1.0 / (255.0 * std)).reshape(1, 3, 1, 1)
+        self._shift = (mean / std).reshape(1, 3, 1, 1)
+        self._local = threading.local()
+
+    def _buffers(self, n):
+        local = self._local
+        if getattr(local, "pixels", None) is None or local.pixels.shape[0] < n:
+            capacity = max(n, self.capacity)
+            local.pixels = np.empty((capacity, self.size, self.size, 3), dtype=np.uint8)
+            local.out = np.empty((capacity, 3, self.size, self.size), dtype=np.float32)
+        return local.pixels, local.out
+
+    def _crop(self, image):
+        if not isinstance(image, Image.Image):
+            image = Image.open(image)
+        image = image.convert("RGB")
+        size = self.size
+        if size < 384:
+            image = _resize_shortest_edge(image, int(size / self.crop_pct), self.resample)
+            width, height = image.size
+            left, top = (width - size) // 2, (height - size) // 2
+            return image.crop((left, top, left + size, top + size))
+        return image.resize((size, size), self.resample)
+
+    def __call__(self, images):
+        n = len(images)
+        pixels, out = self._buffers(n)
+        for i, image in enumerate(images):
+            pixels[i] = np.asarray(self._crop(image))
+
+        batch = out[:n]
+        np.multiply(pixels[:n].transpose(0, 3, 1, 2), self._scale, out=batch)
+        np.subtract(batch, self._shift, out=batch)
+        return batch
+
+
+def preprocess(image, **config):
+    """Single-image convenience wrapper: returns an owned (3, size, size) array."""
+    return BatchPreprocessor(**{**DEFAULT_CONFIG, **config})([image])[0].copy()
+
+
+def validate(folder, model_id, atol=1e-4):
+    """Compare BatchPreprocessor with AutoProcessor on every image in `folder`."""
+    from pathlib import Path
+    from transformers import AutoProcessor
+
+    processor = AutoProcessor.from_pretrained(model_id)
+    batch_preprocessor = BatchPreprocessor(**config_from_processor(processor))
+
+    worst = 0.0
+    paths = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in {".png", ".jpg", ".jpeg", ".bmp", ".gif"})
+    for path in paths:
+        image = Image.open(path).convert("RGB")
+        expected = processor(images=image, return_tensors="np")["pixel_values"][0]
+        actual = batch_preprocessor([image])[0]
+        diff = float(np.abs(expected - actual).max())
+        worst = max(worst, diff)
+        print(f"{path.name}: max abs diff {diff:.2e}")
+    print(f"{len(paths)} images, worst max abs diff {worst:.2e} (tolerance {atol:.0e})")
+    return worst <= atol
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from ai.config import MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="Preprocessing utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("validate", help="Compare against the HuggingFace AutoProcessor")
+    check.add_argument("folder")
+    check.add_argument("--model", default=MODEL_NAME)
+    check.add_argument("--atol", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    sys.exit(0 if validate(args.folder, args.model, args.atol) else 1)
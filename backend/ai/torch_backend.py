@@ -0,0 +1,28 @@
+"""PyTorch eager serving backend (transformers AutoModelForImageClassification)."""
+import torch
+from transformers import AutoProcessor, AutoModelForImageClassification
+
+from ai.preprocess import BatchPreprocessor, config_from_processor
+
+
+class TorchClassifier:
+    def __init__(self, model_name):
+        # The processor only supplies the preprocessing settings; the pixels
+        # are produced by BatchPreprocessor.
+        processor = AutoProcessor.from_pretrained(model_name)
+        self.model = AutoModelForImageClassification.from_pretrained(model_name).eval()
+        self.preprocess = BatchPreprocessor(**config_from_processor(processor))
+
+    def predict_batch(self, image_paths):
+        pixel_values = torch.from_numpy(self.preprocess(image_paths))
+        with torch.inference_mode():
+            logits = self.model(pixel_values=pixel_values).logits
+        probs = torch.softmax(logits, dim=-1)
+        confidences, indices = probs.max(dim=-1)
+        return [
+            {"category": self.model.config.id2label[idx], "confidence": conf}
+            for idx, conf in zip(indices.tolist(), confidences.tolist())
+        ]
+
+    def predict(self, image_path):
+        return self.predict_batch([image_path])[0]
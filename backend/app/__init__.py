@@ -2,10 +2,16 @@ import os
 import logging
 from flask import Flask, jsonify
 from flask_session import Session
-import cloudinary
 
 from app.config import DevelopmentConfig, ProductionConfig
 from app.extensions import db, bcrypt, migrate, cors, login_manager
+from app.leaderboard import leaderboard
+from app.image_index import image_index
+from app.storage import storage
+from app.events import broker
+from app.responses import init_responses
+from app.admission import admission
+from app.memprofile import memory_profiler
 from app.models.user import User  
 def create_app():
     # Determine environment
@@ -47,6 +53,23 @@ def create_app():
         origins = raw_origins
     cors.init_app(app, supports_credentials=True, origins=origins)
 
+    # Trust X-Forwarded-For/-Proto from a known number of proxies, so
+    # request.remote_addr (rate limits) is the real client address
+    proxy_hops = app.config.get("PROXY_FIX_X_FOR", 0)
+    if proxy_hops:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops)
+
+    # Rate limiting + inference load shedding
+    admission.init_app(app)
+
+    # Opt-in memory instrumentation + RSS-based worker recycling
+    memory_profiler.init_app(app)
+
+    # JSON encoding + response compression
+    init_responses(app)
+
     # Login manager
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
@@ -56,13 +79,28 @@ def create_app():
     def load_user(user_id):
         return User.query.get(int(user_id))
 
-    # Cloudinary config
-    cloudinary.config(
-        cloud_name=app.config.get("CLOUDINARY_CLOUD_NAME"),
-        api_key=app.config.get("CLOUDINARY_API_KEY"),
-        api_secret=app.config.get("CLOUDINARY_API_SECRET"),
-        secure=True,
-    )
+    # Leaderboard (in-memory top-K, snapshotted under instance/)
+    leaderboard.init_app(app)
+
+    # Perceptual-hash index of uploaded images (duplicate detection)
+    image_index.init_app(app)
+
+    # Upload events (SSE feed), shared between workers through a log file
+    broker.init_app(app)
+
+    # Upload image storage (local content-addressed, or S3 behind a disk cache)
+    storage.init_app(app)
+
+    # Cloudinary config (imported only when credentials are configured)
+    if app.config.get("CLOUDINARY_CLOUD_NAME"):
+        import cloudinary
+
+        cloudinary.config(
+            cloud_name=app.config.get("CLOUDINARY_CLOUD_NAME"),
+            api_key=app.config.get("CLOUDINARY_API_KEY"),
+            api_secret=app.config.get("CLOUDINARY_API_SECRET"),
+            secure=True,
+        )
 
     # ----------------------------
     # Blueprints
@@ -71,13 +109,27 @@ def create_app():
     from app.routes.profile import profile_bp
     from app.routes.uploads import uploads_bp
     from app.routes.centers import centers_bp
-
+    from app.routes.leaderboard import leaderboard_bp
+    from app.health import health_bp
+    from app.memprofile import memory_bp
 
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(profile_bp, url_prefix="/profile")
     app.register_blueprint(uploads_bp, url_prefix="/uploads")
     app.register_blueprint(centers_bp, url_prefix="/api/centers")
+    app.register_blueprint(leaderboard_bp, url_prefix="/api/leaderboard")
+    app.register_blueprint(health_bp, url_prefix="/health")
+    app.register_blueprint(memory_bp, url_prefix="/admin")
     
+    # ----------------------------
+    # CLI commands
+    # ----------------------------
+    from app.archive import archive_uploads_command
+    from app.profiling import profile_startup_command
+
+    app.cli.add_command(archive_uploads_command)
+    app.cli.add_command(profile_startup_command)
+
     # ----------------------------
     # Routes
     # ----------------------------
@@ -93,7 +145,10 @@ def create_app():
                 "profile": "/profile",
                 "uploads": "/uploads",
                 "centers": "/api/centers",
+                "leaderboard": "/api/leaderboard",
                 "health": "/health",
+                "liveness": "/health/live",
+                "readiness": "/health/ready",
             },
             "documentation": "See AI_CLASSIFICATION_README.md",
         }
@@ -0,0 +1,243 @@
+# backend/app/admission.py
+"""
+Admission control: token-bucket rate limits plus inference load shedding.
+
+Every request is charged against a budget chosen by endpoint ("inference" for
+model-backed endpoints, "auth" for the auth blueprint, "default" for the rest).
+A logged-in request is charged to that user's bucket only; anonymous requests
+share one bucket per client IP. That way many users behind one NAT or proxy
+don't drain each other's budget. Client IPs come from `X-Forwarded-For` only
+when PROXY_FIX_X_FOR trusts that many proxies (see create_app).
+
+Independently of the buckets, inference requests are shed with 503 +
+Retry-After once INFERENCE_MAX_INFLIGHT of them are outstanding, so a burst
+queues at the client instead of in front of the model. The count covers every
+worker on the host (those requests are what waits in the inference service).
+A retry whose Idempotency-Key is already recorded never reaches the model, so
+it is charged to the "default" budget and takes no inference slot.
+
+Buckets live in process memory by default (RATE_LIMIT_STORAGE=memory), so the
+check costs microseconds on every request; RATE_LIMIT_STORAGE=sqlite shares
+them between workers at the price of a write transaction per request.
+Inference slots are taken only by inference requests, so they stay in the
+shared SQLite file (INFERENCE_SLOT_STORAGE=sqlite) to keep the count
+host-wide.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import g, jsonify, request, session
+
+from app.idempotency import is_recorded_retry
+
+INFERENCE_ENDPOINTS = {"uploads.upload_file"}
+AUTH_BLUEPRINTS = {"auth_bp"}
+EXEMPT_ENDPOINTS = {"health", "health.live", "health.ready", "static"}
+
+
+def _refill(tokens, updated_at, capacity, rate, now):
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+class MemoryStore:
+    max_keys = 100_000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._slots = {}  # token -> started_at
+
+    def take(self, key, capacity, rate, now):
+        """Take one token. Returns seconds to wait, 0 when the request is admitted."""
+        with self._lock:
+            tokens, updated_at, _, _ = self._buckets.get(key, (capacity, now, capacity, rate))
+            tokens = _refill(tokens, updated_at, capacity, rate, now)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, capacity, rate)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return wait
+
+    def acquire_slot(self, limit, now, stale_after):
+        """Reserve one of `limit` inference slots. Returns a token, or None when all are taken."""
+        with self._lock:
+            for token, started_at in list(self._slots.items()):
+                if now - started_at > stale_after:
+                    del self._slots[token]
+            if len(self._slots) >= limit:
+                return None
+            token = uuid.uuid4().hex
+            self._slots[token] = now
+            return token
+
+    def release_slot(self, token):
+        with self._lock:
+            self._slots.pop(token, None)
+
+    def slots_in_use(self, now, stale_after):
+        with self._lock:
+            return sum(1 for started_at in self._slots.values() if now - started_at <= stale_after)
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is indistinguishable from a new one.
+        for key, (tokens, updated_at, capacity, rate) in list(self._buckets.items()):
+            if _refill(tokens, updated_at, capacity, rate, now) >= capacity:
+                del self._buckets[key]
+
+
+class SQLiteStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS inference_slots (token TEXT PRIMARY KEY, pid INTEGER NOT NULL, started_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # Losing the last few updates in a power cut is fine for rate limits;
+            # an fsync per request is not
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, rate, now):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(*row, capacity, rate, now) if row else capacity
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire_slot(self, limit, now, stale_after):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Slots held by a worker that died mid-request expire after `stale_after`
+            conn.execute("DELETE FROM inference_slots WHERE started_at < ?", (now - stale_after,))
+            (in_use,) = conn.execute("SELECT COUNT(*) FROM inference_slots").fetchone()
+            token = None
+            if in_use < limit:
+                token = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO inference_slots (token, pid, started_at) VALUES (?, ?, ?)", (token, os.getpid(), now)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return token
+
+    def release_slot(self, token):
+        self._conn().execute("DELETE FROM inference_slots WHERE token = ?", (token,))
+
+    def slots_in_use(self, now, stale_after):
+        (in_use,) = self._conn().execute(
+            "SELECT COUNT(*) FROM inference_slots WHERE started_at >= ?", (now - stale_after,)
+        ).fetchone()
+        return in_use
+
+
+class AdmissionControl:
+    def __init__(self):
+        self.enabled = True
+        self.limits = {}
+        self.max_inflight = 4
+        self.slot_timeout = 120
+        self.shed_retry_after = 2
+        self.store = MemoryStore()  # token buckets
+        self.slots = self.store  # inference slots
+
+    def init_app(self, app):
+        self.enabled = app.config.get("RATE_LIMIT_ENABLED", True)
+        self.limits = app.config.get("RATE_LIMITS", {})
+        self.max_inflight = app.config.get("INFERENCE_MAX_INFLIGHT", self.max_inflight)
+        self.slot_timeout = app.config.get("INFERENCE_SLOT_TIMEOUT", self.slot_timeout)
+        self.shed_retry_after = app.config.get("INFERENCE_SHED_RETRY_AFTER", self.shed_retry_after)
+        sqlite_store = None
+        if app.config.get("RATE_LIMIT_STORAGE", "memory") == "sqlite":
+            sqlite_store = SQLiteStore(app.config["RATE_LIMIT_SQLITE_PATH"])
+        self.store = sqlite_store or MemoryStore()
+        if app.config.get("INFERENCE_SLOT_STORAGE", "sqlite") == "sqlite":
+            self.slots = sqlite_store or SQLiteStore(app.config["RATE_LIMIT_SQLITE_PATH"])
+        else:
+            self.slots = self.store
+
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    @staticmethod
+    def _budget():
+        if request.endpoint in INFERENCE_ENDPOINTS and request.method == "POST" and not is_recorded_retry():
+            return "inference"
+        if request.blueprint in AUTH_BLUEPRINTS:
+            return "auth"
+        return "default"
+
+    @staticmethod
+    def _identity():
+        """The one bucket a request is charged to: the user when logged in, else the client IP."""
+        user_id = session.get("user_id")
+        return f"user:{user_id}" if user_id else f"ip:{request.remote_addr}"
+
+    def _before_request(self):
+        if not self.enabled or request.method == "OPTIONS" or request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+
+        budget = self._budget()
+        capacity, rate = self.limits.get(budget, self.limits.get("default", (60, 1.0)))
+        now = time.time()
+        wait = self.store.take(f"{budget}:{self._identity()}", capacity, rate, now)
+        if wait:
+            return self._reject(429, "Too many requests", wait)
+
+        if budget == "inference":
+            token = self.slots.acquire_slot(self.max_inflight, now, self.slot_timeout)
+            if token is None:
+                return self._reject(503, "Inference queue is full, retry shortly", self.shed_retry_after)
+            g.inference_slot = token
+        return None
+
+    def inference_depth(self):
+        """Inference requests currently outstanding (host-wide with the SQLite store)."""
+        return self.slots.slots_in_use(time.time(), self.slot_timeout)
+
+    def _teardown_request(self, exc):
+        token = g.pop("inference_slot", None)
+        if token is not None:
+            self.slots.release_slot(token)
+
+    @staticmethod
+    def _reject(status, message, retry_after):
+        retry_after = max(1, math.ceil(retry_after))
+        response = jsonify({"error": message, "retry_after": retry_after})
+        response.status_code = status
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+
+
+admission = AdmissionControl()
@@ -0,0 +1,193 @@
+# backend/app/archive.py
+"""
+Cold-data archival of verified uploads to monthly Parquet files.
+
+`flask archive-uploads --older-than-days 365` moves verified uploads older than
+the cutoff into zstd-compressed Parquet files partitioned by month
+(`instance/archive/uploads/year=YYYY/month=MM/part-*.parquet`) and deletes
+them from the live table. Readers here let export/analytics endpoints union
+archived rows back in; pyarrow is only imported once an archive exists.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+ARCHIVE_COLUMNS = (
+    "id", "user_id", "user_name", "filename_url", "category", "confidence",
+    "points_awarded", "weight", "centre_id", "not_verified", "upload_date",
+)
+DELETE_CHUNK = 500
+
+
+def archive_root():
+    return current_app.config["UPLOAD_ARCHIVE_DIR"]
+
+
+def has_archive():
+    root = archive_root()
+    if not os.path.isdir(root):
+        return False
+    return any(name.endswith(".parquet") for _, _, files in os.walk(root) for name in files)
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("user_name", pa.string()),
+        ("filename_url", pa.string()),
+        ("category", pa.string()),
+        ("confidence", pa.float64()),
+        ("points_awarded", pa.int64()),
+        ("weight", pa.float64()),
+        ("centre_id", pa.int64()),
+        ("not_verified", pa.bool_()),
+        ("upload_date", pa.timestamp("us")),
+    ])
+
+
+def _dataset():
+    import pyarrow.dataset as ds
+
+    return ds.dataset(archive_root(), format="parquet", partitioning="hive", schema=_schema())
+
+
+def iter_archived(centre_ids=None, user_id=None, date_from=None, date_before=None, batch_size=1000):
+    """
+    Yield archived uploads as dicts (ARCHIVE_COLUMNS), oldest file first.
+
+    `centre_ids` / `user_id` restrict the rows when given; `date_before` is an
+    exclusive upper bound.
+    """
+    if not has_archive():
+        return
+    if centre_ids is not None and not centre_ids:
+        return
+    import pyarrow.dataset as ds
+
+    expr = None
+    for cond in (
+        ds.field("centre_id").isin(list(centre_ids)) if centre_ids is not None else None,
+        ds.field("user_id") == user_id if user_id is not None else None,
+        ds.field("upload_date") >= date_from if date_from else None,
+        ds.field("upload_date") < date_before if date_before else None,
+    ):
+        if cond is not None:
+            expr = cond if expr is None else expr & cond
+
+    scanner = _dataset().scanner(columns=list(ARCHIVE_COLUMNS), filter=expr, batch_size=batch_size)
+    for batch in scanner.to_batches():
+        yield from batch.to_pylist()
+
+
+def archived_points():
+    """Verified points per (user_id, centre_id) held in the archive."""
+    if not has_archive():
+        return []
+    table = _dataset().to_table(columns=["user_id", "centre_id", "points_awarded"])
+    grouped = table.group_by(["user_id", "centre_id"]).aggregate([("points_awarded", "sum")])
+    return list(zip(
+        grouped["user_id"].to_pylist(),
+        grouped["centre_id"].to_pylist(),
+        grouped["points_awarded_sum"].to_pylist(),
+    ))
+
+
+def archive_uploads(cutoff, batch_size=1000, dry_run=False):
+    """
+    Move verified uploads older than `cutoff` into the archive.
+
+    Files are written under temporary names, the rows are deleted, the files
+    are renamed into place and only then is the delete committed; a failure
+    at any step leaves the live table untouched.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from app.extensions import db
+    from app.models.uploads import Upload
+
+    query = (
+        Upload.query
+        .filter(Upload.not_verified.is_(False), Upload.upload_date < cutoff)
+        .order_by(Upload.upload_date.asc(), Upload.id.asc())
+        .yield_per(batch_size)
+    )
+
+    schema = _schema()
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    written, ids, counts = [], [], {}
+    writer, month, pending = None, None, []
+
+    def flush():
+        if pending:
+            writer.write_table(pa.Table.from_pylist(pending, schema=schema))
+            pending.clear()
+
+    try:
+        for u in query:
+            row = {col: getattr(u, col) for col in ARCHIVE_COLUMNS}
+            row_month = (u.upload_date.year, u.upload_date.month)
+            counts[row_month] = counts.get(row_month, 0) + 1
+            ids.append(u.id)
+            if dry_run:
+                continue
+            if row_month != month:
+                if writer is not None:
+                    flush()
+                    writer.close()
+                month = row_month
+                directory = os.path.join(archive_root(), f"year={month[0]:04d}", f"month={month[1]:02d}")
+                os.makedirs(directory, exist_ok=True)
+                final_path = os.path.join(directory, f"part-{stamp}.parquet")
+                # Dot-prefixed so dataset discovery ignores it until it is renamed
+                written.append((os.path.join(directory, f".part-{stamp}.parquet.tmp"), final_path))
+                writer = pq.ParquetWriter(written[-1][0], schema, compression="zstd")
+            pending.append(row)
+            if len(pending) >= batch_size:
+                flush()
+        if writer is not None:
+            flush()
+            writer.close()
+            writer = None
+
+        if dry_run or not ids:
+            return counts
+
+        for start in range(0, len(ids), DELETE_CHUNK):
+            chunk = ids[start:start + DELETE_CHUNK]
+            Upload.query.filter(Upload.id.in_(chunk)).delete(synchronize_session=False)
+        for tmp_path, final_path in written:
+            os.replace(tmp_path, final_path)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if writer is not None:
+            writer.close()
+        for tmp_path, final_path in written:
+            for path in (tmp_path, final_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        raise
+    return counts
+
+
+@click.command("archive-uploads")
+@click.option("--older-than-days", default=365, show_default=True, help="Archive verified uploads older than this.")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--dry-run", is_flag=True, help="Only report what would be archived.")
+@with_appcontext
+def archive_uploads_command(older_than_days, batch_size, dry_run):
+    """Move old verified uploads from the live table into monthly Parquet files."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    counts = archive_uploads(cutoff, batch_size=batch_size, dry_run=dry_run)
+    verb = "Would archive" if dry_run else "Archived"
+    for (year, month), count in sorted(counts.items()):
+        click.echo(f"{year:04d}-{month:02d}: {count}")
+    click.echo(f"{verb} {sum(counts.values())} uploads older than {cutoff:%Y-%m-%d}")
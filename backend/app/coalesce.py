@@ -0,0 +1,101 @@
+# backend/app/coalesce.py
+"""
+Single-flight coalescing for expensive read endpoints.
+
+Concurrent identical requests (same endpoint, view args, query string and
+authorization scope) share one execution of the view: the first caller
+computes the response, the others wait for it and replay its serialized body.
+With COALESCE_TTL_SECONDS > 0 (off by default) a successful result is also
+replayed to identical requests arriving shortly afterwards. Views that change
+the data behind a coalesced endpoint call `invalidate()` for it, so a client
+reads its own write; other workers may still replay for up to the TTL.
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request, session
+
+_flights = {}
+_lock = threading.Lock()
+
+
+class _Flight:
+    __slots__ = ("event", "result", "done_at")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None  # (body, status, headers) once the leader succeeds
+        self.done_at = None
+
+
+def _scope_key(scope):
+    if scope == "user":
+        return ("user", session.get("user_id"))
+    if scope == "role":
+        return ("role", session.get("role"))
+    return ("public",)
+
+
+def _prune(now, ttl):
+    for key, flight in list(_flights.items()):
+        if flight.done_at is not None and now - flight.done_at >= ttl:
+            del _flights[key]
+
+
+def invalidate(*endpoints):
+    """Forget cached and in-flight results of `endpoints`; the next request computes afresh."""
+    with _lock:
+        for key in [key for key in _flights if key[0] in endpoints]:
+            del _flights[key]
+
+
+def coalesce(scope="user"):
+    """
+    Share one in-flight computation between identical concurrent requests.
+
+    `scope` decides whose requests may share a result: "user" (same session
+    user), "role" (same session role) or "public" (everyone).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            ttl = current_app.config.get("COALESCE_TTL_SECONDS", 0)
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                _scope_key(scope),
+            )
+            now = time.monotonic()
+            with _lock:
+                _prune(now, ttl)
+                flight = _flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _flights[key] = _Flight()
+
+            if not leader:
+                flight.event.wait(current_app.config.get("COALESCE_WAIT_SECONDS", 30))
+                if flight.result is not None:
+                    body, status, headers = flight.result
+                    return current_app.response_class(body, status=status, headers=headers)
+                # Leader failed or timed out: compute independently
+                return view(*args, **kwargs)
+
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+                if not response.is_streamed and response.status_code < 500:
+                    flight.result = (response.get_data(), response.status_code, list(response.headers.items()))
+                return response
+            finally:
+                with _lock:
+                    flight.done_at = time.monotonic()
+                    failed = flight.result is None or flight.result[1] != 200
+                    if (failed or not ttl) and _flights.get(key) is flight:
+                        del _flights[key]  # unless invalidate() replaced it already
+                flight.event.set()
+
+        return wrapper
+
+    return decorator
@@ -20,10 +20,17 @@ class Config:
     COOKIE_SAMESITE = os.environ.get("COOKIE_SAMESITE", "Lax")
     ACCESS_TOKEN_EXPIRES = int(os.environ.get("ACCESS_TOKEN_EXPIRES", 3600))  # 1 hour
 
+    # Number of reverse proxies in front of the app whose X-Forwarded-For /
+    # X-Forwarded-Proto can be trusted (0 = use the socket peer address)
+    PROXY_FIX_X_FOR = int(os.environ.get("PROXY_FIX_X_FOR", 0))
+
     CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "http://localhost:3000")
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10 MB (for JSON / image uploads)
     JSON_AS_ASCII = False  # Ensure UTF-8 encoding
     JSON_SORT_KEYS = False  # Keep response fields in readable order
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))  # bytes; smaller bodies go uncompressed
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
 
     CLOUDINARY_CLOUD_NAME = os.environ.get("CLOUDINARY_CLOUD_NAME")
     CLOUDINARY_API_KEY = os.environ.get("CLOUDINARY_API_KEY")
@@ -31,6 +38,85 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "static", "uploads", "profile_images")
     ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 
+    LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", 10))
+    LEADERBOARD_RESYNC_SECONDS = int(os.environ.get("LEADERBOARD_RESYNC_SECONDS", 300))
+    LEADERBOARD_SNAPSHOT_SECONDS = int(os.environ.get("LEADERBOARD_SNAPSHOT_SECONDS", 60))
+    LEADERBOARD_SNAPSHOT_PATH = os.path.join(INSTANCE_DIR, "leaderboard.json")
+
+    # Admission control: (bucket capacity, tokens refilled per second) per budget,
+    # applied per client IP and per logged-in user
+    RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    RATE_LIMIT_STORAGE = os.environ.get("RATE_LIMIT_STORAGE", "memory")  # "memory" (per worker) or "sqlite" (shared)
+    RATE_LIMIT_SQLITE_PATH = os.path.join(INSTANCE_DIR, "rate_limits.db")
+    RATE_LIMITS = {
+        "inference": (10, 10 / 60),  # bursts of 10, then 10 per minute
+        "auth": (5, 5 / 60),
+        "default": (120, 2.0),
+    }
+    INFERENCE_MAX_INFLIGHT = int(os.environ.get("INFERENCE_MAX_INFLIGHT", 4))  # per host with sqlite slot storage
+    INFERENCE_SLOT_STORAGE = os.environ.get("INFERENCE_SLOT_STORAGE", "sqlite")  # "sqlite" (per host) or "memory"
+    INFERENCE_SLOT_TIMEOUT = 120  # seconds before a slot held by a dead worker is reclaimed
+    INFERENCE_SHED_RETRY_AFTER = 2  # seconds
+
+    # `flask profile-startup --budget` default: max seconds for import + create_app()
+    STARTUP_BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", 3.0))
+
+    # Request coalescing for heavy reads (app/coalesce.py): identical concurrent
+    # requests share one computation; results are replayed for this long after
+    # (0 = only while in flight; other workers can serve stale data within the TTL)
+    COALESCE_TTL_SECONDS = float(os.environ.get("COALESCE_TTL_SECONDS", 0))
+    COALESCE_WAIT_SECONDS = 30
+
+    # Memory instrumentation (app/memprofile.py); off by default
+    MEMPROFILE_ENABLED = os.environ.get("MEMPROFILE_ENABLED", "False").lower() == "true"
+    MEMPROFILE_SNAPSHOT_EVERY = int(os.environ.get("MEMPROFILE_SNAPSHOT_EVERY", 500))  # requests
+    MEMPROFILE_SAMPLE_RATE = float(os.environ.get("MEMPROFILE_SAMPLE_RATE", 0.1))
+    MEMPROFILE_TRACEBACK_FRAMES = 10
+    MEMPROFILE_ADMIN_TOKEN = os.environ.get("MEMPROFILE_ADMIN_TOKEN")
+    # Recycle a worker once its RSS passes this many MiB (0 disables)
+    WORKER_MAX_RSS_MB = int(os.environ.get("WORKER_MAX_RSS_MB", 0))
+    WORKER_RSS_CHECK_EVERY = 50  # requests
+
+    # Idempotency-Key replay for POST /uploads/ and PATCH /uploads/approve/<id>
+    IDEMPOTENCY_STORAGE = os.environ.get("IDEMPOTENCY_STORAGE", "sqlite")  # "sqlite" (shared) or "memory"
+    IDEMPOTENCY_SQLITE_PATH = os.path.join(INSTANCE_DIR, "idempotency.db")
+    IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+    IDEMPOTENCY_PENDING_TIMEOUT = 120  # seconds before an unfinished request's key can be reused
+    IDEMPOTENCY_MAX_ENTRIES = 10_000  # memory store only
+
+    # Readiness probes (/health/ready)
+    HEALTH_CACHE_SECONDS = int(os.environ.get("HEALTH_CACHE_SECONDS", 5))
+    HEALTH_WARMUP_RETRY_SECONDS = int(os.environ.get("HEALTH_WARMUP_RETRY_SECONDS", 10))  # doubles per failure
+    HEALTH_WARMUP_RETRY_MAX_SECONDS = int(os.environ.get("HEALTH_WARMUP_RETRY_MAX_SECONDS", 300))
+    HEALTH_MAX_INFLIGHT = int(os.environ.get("HEALTH_MAX_INFLIGHT", 0)) or None  # defaults to INFERENCE_MAX_INFLIGHT
+
+    # Upload images: content-addressed on local disk ("local") or in an
+    # S3-compatible bucket ("s3", e.g. MinIO) behind a per-node disk cache
+    UPLOAD_STORAGE = os.environ.get("UPLOAD_STORAGE", "local")
+    UPLOAD_STORAGE_DIR = os.environ.get("UPLOAD_STORAGE_DIR", os.path.join(INSTANCE_DIR, "uploads"))
+    UPLOAD_CACHE_DIR = os.environ.get("UPLOAD_CACHE_DIR", os.path.join(INSTANCE_DIR, "upload_cache"))
+    UPLOAD_CACHE_MAX_BYTES = int(os.environ.get("UPLOAD_CACHE_MAX_BYTES", 1024 * 1024 * 1024))  # 1 GiB
+    UPLOAD_MAX_AGE = 365 * 24 * 3600  # Cache-Control max-age for served images (content never changes)
+    S3_BUCKET = os.environ.get("S3_BUCKET")
+    S3_PREFIX = os.environ.get("S3_PREFIX", "uploads")
+    S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+    S3_REGION = os.environ.get("S3_REGION")
+    S3_ACCESS_KEY_ID = os.environ.get("S3_ACCESS_KEY_ID")
+    S3_SECRET_ACCESS_KEY = os.environ.get("S3_SECRET_ACCESS_KEY")
+
+    # Upload events for the SSE feed, shared by all workers on the host
+    EVENTS_LOG_PATH = os.path.join(INSTANCE_DIR, "upload_events.log")
+    EVENTS_LOG_MAX_BYTES = 16 * 1024 * 1024  # rotated to .1 past this size
+    EVENTS_POLL_SECONDS = 0.5
+
+    # Cold storage for old verified uploads (see `flask archive-uploads`)
+    UPLOAD_ARCHIVE_DIR = os.path.join(INSTANCE_DIR, "archive", "uploads")
+
+    # Perceptual-hash duplicate detection (Hamming distance in bits, out of 64)
+    PHASH_INDEX_PATH = os.path.join(INSTANCE_DIR, "upload_hashes.bin")
+    PHASH_MAX_DISTANCE = int(os.environ.get("PHASH_MAX_DISTANCE", 6))
+    PHASH_REUSE_DISTANCE = int(os.environ.get("PHASH_REUSE_DISTANCE", 2))
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -0,0 +1,265 @@
+# backend/app/events.py
+"""
+Pub/sub for upload events, consumed by the SSE feed.
+
+Publishers append one JSON line per event to `instance/upload_events.log`
+(EVENTS_LOG_PATH), so an upload or approval handled by any worker on the host
+reaches every subscriber. Each process tails that file from a background
+thread into a bounded ring buffer and wakes its subscribers; a subscriber
+keeps its own cursor, so fan-out costs one shared list no matter how many
+dashboards are connected.
+
+Event ids are `<epoch>-<offset>`: the epoch is a random token written as the
+first line of each log file and the offset is the byte position just after
+the event, so ids are valid in every worker. A cursor older than the ring buffer is replayed from
+the file; one from a rotated log (EVENTS_LOG_MAX_BYTES) cannot be resumed and
+the subscriber is told to reload instead.
+
+Without EVENTS_LOG_PATH the broker stays in process memory (single worker).
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+MAX_REPLAY_BYTES = 4 * 1024 * 1024
+
+
+class EventBroker:
+    def __init__(self, history=1000):
+        self.path = None
+        self.max_bytes = 16 * 1024 * 1024
+        self.poll_seconds = 0.5
+        self.epoch = format(int(time.time() * 1000), "x")
+        self._cond = threading.Condition()
+        self._publish_lock = threading.Lock()
+        self._events = deque(maxlen=history)  # (start, end, type, data, centre_id)
+        self._last_seq = 0
+        self._tailing = False
+        self._poller = None
+
+    def init_app(self, app):
+        self.path = app.config.get("EVENTS_LOG_PATH")
+        self.max_bytes = app.config.get("EVENTS_LOG_MAX_BYTES", self.max_bytes)
+        self.poll_seconds = app.config.get("EVENTS_POLL_SECONDS", self.poll_seconds)
+        with self._cond:
+            self._events.clear()
+            self._tailing = False
+            self._last_seq = 0
+        if self.path:
+            # Exists from the start, so the first tail fixes the epoch before any publish
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                self._write_header(fd)
+            finally:
+                os.close(fd)
+
+    # ----------------------------
+    # Publishing
+    # ----------------------------
+    def publish(self, event_type, data, centre_id=None):
+        if not self.path:
+            with self._cond:
+                start = self._last_seq
+                self._last_seq += 1
+                self._events.append((start, self._last_seq, event_type, data, centre_id))
+                self._cond.notify_all()
+            return
+
+        line = (json.dumps({"type": event_type, "data": data, "centre_id": centre_id}, default=str) + "\n").encode()
+        with self._publish_lock:
+            try:
+                self._append(line)
+            except OSError as e:
+                logger.warning(f"Could not publish {event_type} event: {e}")
+                return
+        self._poll()
+
+    def _append(self, line):
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                st = os.fstat(fd)
+                try:
+                    current = os.stat(self.path).st_ino
+                except FileNotFoundError:
+                    current = None
+                if current != st.st_ino:
+                    continue  # rotated by another worker while we waited for the lock
+                if st.st_size + len(line) > self.max_bytes and st.st_size:
+                    os.replace(self.path, f"{self.path}.1")
+                    continue
+                self._write_header(fd)
+                os.write(fd, line)
+                return
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def _write_header(fd):
+        """Give a new, empty log its epoch (flock held)."""
+        if os.fstat(fd).st_size == 0:
+            os.write(fd, (json.dumps({"epoch": uuid.uuid4().hex[:12]}) + "\n").encode())
+
+    @staticmethod
+    def _read_epoch(fh):
+        """(epoch, header length) of an open log, or (None, 0) if the header is not written yet."""
+        header = fh.readline()
+        if not header.endswith(b"\n"):
+            return None, 0
+        try:
+            return json.loads(header)["epoch"], len(header)
+        except (ValueError, KeyError):
+            return None, 0
+
+    # ----------------------------
+    # Tailing
+    # ----------------------------
+    def _poll(self):
+        """Read events appended to the log since the last poll."""
+        if not self.path:
+            return
+        try:
+            fh = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with fh, self._cond:
+            epoch, header_size = self._read_epoch(fh)
+            if epoch is None:
+                return
+            if epoch != self.epoch or not self._tailing:
+                # New (or rotated) log: ids from the previous file cannot be resumed
+                first = not self._tailing
+                self._tailing = True
+                self.epoch = epoch
+                self._events.clear()
+                self._last_seq = os.fstat(fh.fileno()).st_size if first else header_size
+                if not first:
+                    self._cond.notify_all()
+            fh.seek(self._last_seq)
+            data = fh.read()
+            usable = data.rfind(b"\n") + 1  # ignore a partially written tail
+            if not usable:
+                return
+            offset = self._last_seq
+            for raw in data[:usable].splitlines(keepends=True):
+                start, offset = offset, offset + len(raw)
+                event = self._decode(raw)
+                if event is not None:
+                    self._events.append((start, offset, *event))
+            self._last_seq = offset
+            self._cond.notify_all()
+
+    @staticmethod
+    def _decode(raw):
+        try:
+            event = json.loads(raw)
+            return event["type"], event["data"], event.get("centre_id")
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Skipping unreadable event record: {e}")
+            return None
+
+    def _ensure_poller(self):
+        if not self.path or (self._poller is not None and self._poller.is_alive()):
+            return
+        with self._publish_lock:
+            if self._poller is not None and self._poller.is_alive():
+                return
+            self._poll()
+            self._poller = threading.Thread(target=self._poll_loop, name="event-log-tail", daemon=True)
+            self._poller.start()
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self._poll()
+            except OSError as e:
+                logger.warning(f"Could not read event log: {e}")
+
+    # ----------------------------
+    # Subscribing
+    # ----------------------------
+    def cursor(self):
+        """(epoch, seq) for "from now on"."""
+        self._ensure_poller()
+        with self._cond:
+            return self.epoch, self._last_seq
+
+    def event_id(self, cursor):
+        return f"{cursor[0]}-{cursor[1]}"
+
+    def parse_event_id(self, event_id):
+        """Cursor for a Last-Event-ID, or None when it cannot be resumed."""
+        self._ensure_poller()
+        epoch, _, seq = (event_id or "").partition("-")
+        if not seq.isdigit():
+            return None
+        if epoch != self.epoch or int(seq) > self._last_seq:
+            self._poll()  # the id may come from a worker that has read further than we have
+        if epoch != self.epoch or int(seq) > self._last_seq:
+            return None
+        return epoch, int(seq)
+
+    def since(self, cursor, centre_id=None):
+        """
+        Events after `cursor` as (cursor, type, data) tuples, plus the cursor to
+        resume from next time. The event list is None when those events can no
+        longer be delivered (log rotated, or too far behind).
+        """
+        epoch, seq = cursor
+        with self._cond:
+            current = (self.epoch, self._last_seq)
+            if epoch != self.epoch:
+                return None, current
+            if self._events and self._events[0][0] <= seq:
+                events = [(s, e, t, d, c) for s, e, t, d, c in self._events if e > seq]
+            elif seq == self._last_seq:
+                events = []
+            else:
+                events = self._read_range(seq, self._last_seq)
+                if events is None:
+                    return None, current
+        return [
+            ((epoch, end), event_type, data)
+            for _, end, event_type, data, c in events
+            if centre_id is None or c == centre_id
+        ], current
+
+    def _read_range(self, start, end):
+        """Events between two offsets, read back from the log (lock held)."""
+        if not self.path or end - start > MAX_REPLAY_BYTES:
+            return None
+        try:
+            with open(self.path, "rb") as fh:
+                if self._read_epoch(fh)[0] != self.epoch:
+                    return None
+                fh.seek(start)
+                data = fh.read(end - start)
+        except OSError:
+            return None
+        events, offset = [], start
+        for raw in data.splitlines(keepends=True):
+            begin, offset = offset, offset + len(raw)
+            event = self._decode(raw)
+            if event is not None:
+                events.append((begin, offset, *event))
+        return events
+
+    def wait(self, cursor, timeout):
+        """Block until an event newer than `cursor` arrives (or the log rotates) or `timeout` elapses."""
+        self._ensure_poller()
+        epoch, seq = cursor
+        with self._cond:
+            return self._cond.wait_for(lambda: self.epoch != epoch or self._last_seq > seq, timeout)
+
+
+broker = EventBroker()
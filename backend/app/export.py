@@ -0,0 +1,71 @@
+# backend/app/export.py
+"""
+Helpers for the streaming upload export (`GET /uploads/export`): query-arg
+parsing, line encoding and incremental gzip. Kept free of model imports.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+
+from flask import request
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_FIELDS = (
+    "id", "user_id", "user_name", "filename_url", "category", "confidence",
+    "points_awarded", "weight", "centre_id", "not_verified", "upload_date",
+)
+
+
+def parse_date_arg(name, end=False):
+    """
+    Parse an ISO date/datetime query arg. Returns (value, error).
+
+    With `end`, the value is an exclusive upper bound: a bare date covers the
+    whole day (`to=2024-01-31` -> before 2024-02-01 00:00).
+    """
+    raw = request.args.get(name)
+    if not raw:
+        return None, None
+    try:
+        value = datetime.fromisoformat(raw)
+    except ValueError:
+        return None, f"Invalid '{name}' date, expected ISO format (YYYY-MM-DD)"
+    if end:
+        value += timedelta(days=1) if len(raw) == 10 else timedelta(microseconds=1)
+    return value, None
+
+
+def export_lines(rows, fmt):
+    """Encode export rows one line at a time so memory stays flat."""
+    if fmt == "ndjson":
+        for row in rows:
+            yield (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+        return
+
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks, flush_every=64 * 1024):
+    """Gzip a byte stream incrementally, flushing roughly every `flush_every` input bytes."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    pending = 0
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_every:
+            out += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if out:
+            yield out
+    yield compressor.flush()
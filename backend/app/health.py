@@ -0,0 +1,123 @@
+# backend/app/health.py
+"""
+Liveness and readiness probes.
+
+/health/live only says the process is serving requests. /health/ready also
+checks that the database answers, that the model is loaded and warmed, and
+that the inference queue has room. Probe results are cached for
+HEALTH_CACHE_SECONDS so frequent load-balancer polling costs nothing. The
+first readiness probe kicks off model warmup in the background; the worker
+reports not ready until it finishes. A failed warmup is retried with
+exponential backoff (HEALTH_WARMUP_RETRY_SECONDS, capped at
+HEALTH_WARMUP_RETRY_MAX_SECONDS), so one transient failure does not take the
+worker out of rotation for good.
+"""
+import math
+import sys
+import threading
+import time
+
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import text
+
+from app.admission import admission
+from app.extensions import db
+
+health_bp = Blueprint("health", __name__, url_prefix="/health")
+
+_cache = {}
+_cache_lock = threading.Lock()
+_warmup = {"thread": None, "error": None, "failed_at": 0.0, "failures": 0}
+
+
+def _cached(name, probe):
+    ttl = current_app.config.get("HEALTH_CACHE_SECONDS", 5)
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(name)
+        if hit and now - hit[2] < ttl:
+            return hit[0], hit[1]
+    try:
+        ok, detail = probe()
+    except Exception as e:
+        ok, detail = False, str(e)
+    with _cache_lock:
+        _cache[name] = (ok, detail, now)
+    return ok, detail
+
+
+def _check_database():
+    try:
+        db.session.execute(text("SELECT 1"))
+    finally:
+        db.session.rollback()
+    return True, "ok"
+
+
+def _run_warmup(app):
+    try:
+        from ai.create_model import warmup
+        from app.image_index import image_index
+
+        image_index.warm()
+        warmup()
+    except Exception as e:
+        _warmup["failures"] += 1
+        _warmup["failed_at"] = time.monotonic()
+        _warmup["error"] = str(e)
+        app.logger.error(f"Model warmup failed (attempt {_warmup['failures']}): {e}")
+    else:
+        _warmup["failures"] = 0
+
+
+def _retry_delay(config, failures):
+    base = config.get("HEALTH_WARMUP_RETRY_SECONDS", 10)
+    return min(config.get("HEALTH_WARMUP_RETRY_MAX_SECONDS", 300), base * 2 ** max(0, failures - 1))
+
+
+def _check_model():
+    # Only look ai.create_model up here: the probe must stay cheap. Until the
+    # warmup thread (or an upload) has run an inference, it is not warm.
+    create_model = sys.modules.get("ai.create_model")
+    if create_model is not None and create_model.is_warm():
+        return True, "ok"
+    if _warmup["error"]:
+        remaining = _retry_delay(current_app.config, _warmup["failures"]) - (time.monotonic() - _warmup["failed_at"])
+        if remaining > 0:
+            return False, f"warmup failed: {_warmup['error']} (retrying in {math.ceil(remaining)}s)"
+        _warmup["error"] = None
+        _warmup["thread"] = None
+    if _warmup["thread"] is None:
+        _warmup["thread"] = threading.Thread(
+            target=_run_warmup, args=(current_app._get_current_object(),), daemon=True
+        )
+        _warmup["thread"].start()
+    return False, "warming up"
+
+
+def _check_inference_queue():
+    limit = current_app.config.get("HEALTH_MAX_INFLIGHT") or admission.max_inflight
+    depth = admission.inference_depth()
+    return depth < limit, f"{depth}/{limit} in flight"
+
+
+@health_bp.route("/live", methods=["GET"])
+def live():
+    return jsonify({"status": "alive", "service": "eco-collect-api"}), 200
+
+
+@health_bp.route("/ready", methods=["GET"])
+def ready():
+    checks = {}
+    for name, probe in (("database", _check_database), ("model", _check_model)):
+        ok, detail = _cached(name, probe)
+        checks[name] = {"ok": ok, "detail": detail}
+    ok, detail = _check_inference_queue()  # a counter read; never cached
+    checks["inference_queue"] = {"ok": ok, "detail": detail}
+
+    is_ready = all(c["ok"] for c in checks.values())
+    return jsonify({
+        "status": "ready" if is_ready else "not_ready",
+        "service": "eco-collect-api",
+        "checks": checks,
+    }), 200 if is_ready else 503
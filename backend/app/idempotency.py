@@ -0,0 +1,254 @@
+# backend/app/idempotency.py
+"""
+Idempotency-Key support for retried mutations.
+
+A client may send `Idempotency-Key: <unique string>` on a decorated endpoint.
+The first request with a given key (per user and endpoint) runs normally and
+its response is recorded; retries within IDEMPOTENCY_TTL_SECONDS replay the
+recorded response (with `Idempotent-Replayed: true`) without running the view
+again, so no second inference and no duplicate row. A retry that arrives while
+the original is still running gets 409 + Retry-After. Reusing a key for a
+different request (method, path, form fields, uploaded files or body) gets 422.
+Server errors (5xx) are not recorded, so those can be retried for real.
+
+Admission control runs before the view, so it asks `is_recorded_retry()`
+first: a retry that will be answered from its record is not charged to the
+inference budget.
+
+Records live in a small SQLite file shared by all workers on the host
+(IDEMPOTENCY_STORAGE=sqlite, the default) or in a per-process LRU ("memory").
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request, session
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+NEW, REPLAY, IN_PROGRESS, MISMATCH = "new", "replay", "in_progress", "mismatch"
+FORM_MIMETYPES = ("multipart/form-data", "application/x-www-form-urlencoded")
+
+
+def _decide(record, fingerprint, now, ttl, pending_timeout):
+    """What to do with an existing record: None means start over."""
+    if record is None:
+        return None
+    state, stored_fingerprint, created_at = record[0], record[1], record[2]
+    if state == "done" and now - created_at < ttl:
+        return MISMATCH if stored_fingerprint != fingerprint else REPLAY
+    if state == "pending" and now - created_at < pending_timeout:
+        return MISMATCH if stored_fingerprint != fingerprint else IN_PROGRESS
+    return None  # expired, or the original worker died mid-request
+
+
+def _is_live(record, now, ttl, pending_timeout):
+    """Whether `record` will answer the next request with its key (replay, 409 or 422)."""
+    # A live record answers whatever the fingerprint, so compare it with itself
+    return _decide(record, record[1] if record else None, now, ttl, pending_timeout) is not None
+
+
+class MemoryStore:
+    def __init__(self, max_entries=10_000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._records = OrderedDict()  # key -> [state, fingerprint, created_at, response]
+
+    def begin(self, key, fingerprint, now, ttl, pending_timeout):
+        with self._lock:
+            record = self._records.get(key)
+            decision = _decide(record, fingerprint, now, ttl, pending_timeout)
+            if decision is not None:
+                self._records.move_to_end(key)
+                return decision, record[3] if decision == REPLAY else None
+            self._records[key] = ["pending", fingerprint, now, None]
+            self._records.move_to_end(key)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+            return NEW, None
+
+    def has_record(self, key, now, ttl, pending_timeout):
+        with self._lock:
+            return _is_live(self._records.get(key), now, ttl, pending_timeout)
+
+    def complete(self, key, response, now):
+        with self._lock:
+            if key in self._records:
+                self._records[key] = ["done", self._records[key][1], now, response]
+
+    def abort(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+
+class SQLiteStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+            " key TEXT PRIMARY KEY, state TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " created_at REAL NOT NULL, status INTEGER, headers TEXT, body BLOB)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_idempotency_created_at ON idempotency_keys (created_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def begin(self, key, fingerprint, now, ttl, pending_timeout):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            record = conn.execute(
+                "SELECT state, fingerprint, created_at, status, headers, body FROM idempotency_keys WHERE key = ?",
+                (key,),
+            ).fetchone()
+            decision = _decide(record, fingerprint, now, ttl, pending_timeout)
+            if decision is None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO idempotency_keys (key, state, fingerprint, created_at) "
+                    "VALUES (?, 'pending', ?, ?)",
+                    (key, fingerprint, now),
+                )
+                # Opportunistic cleanup keeps the table compact
+                conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (now - max(ttl, pending_timeout),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if decision is None:
+            return NEW, None
+        if decision == REPLAY:
+            return REPLAY, (record[3], json.loads(record[4]), record[5])
+        return decision, None
+
+    def has_record(self, key, now, ttl, pending_timeout):
+        record = self._conn().execute(
+            "SELECT state, fingerprint, created_at FROM idempotency_keys WHERE key = ?", (key,)
+        ).fetchone()
+        return _is_live(record, now, ttl, pending_timeout)
+
+    def complete(self, key, response, now):
+        status, headers, body = response
+        self._conn().execute(
+            "UPDATE idempotency_keys SET state = 'done', created_at = ?, status = ?, headers = ?, body = ? "
+            "WHERE key = ?",
+            (now, status, json.dumps(headers), body, key),
+        )
+
+    def abort(self, key):
+        self._conn().execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+
+
+_store = {"instance": None}
+_store_lock = threading.Lock()
+
+
+def _get_store():
+    if _store["instance"] is None:
+        with _store_lock:
+            if _store["instance"] is None:
+                config = current_app.config
+                if config.get("IDEMPOTENCY_STORAGE", "sqlite") == "sqlite":
+                    _store["instance"] = SQLiteStore(config["IDEMPOTENCY_SQLITE_PATH"])
+                else:
+                    _store["instance"] = MemoryStore(config.get("IDEMPOTENCY_MAX_ENTRIES", 10_000))
+    return _store["instance"]
+
+
+def _request_key(client_key):
+    owner = session.get("user_id") or f"ip:{request.remote_addr}"
+    return f"{owner}:{request.endpoint}:{client_key}"
+
+
+def _fingerprint():
+    """Hash of everything that makes a request distinct: method, path and payload."""
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    if request.mimetype in FORM_MIMETYPES:
+        for name, value in sorted(request.form.items(multi=True)):
+            digest.update(f"form {name}={value}\n".encode())
+        for name, file in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(f"file {name} {file.filename}\n".encode())
+            while True:
+                chunk = file.stream.read(1024 * 1024)
+                if not chunk:
+                    break
+                digest.update(chunk)
+            file.stream.seek(0)  # the view reads it again
+    else:
+        digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _settings():
+    config = current_app.config
+    return config.get("IDEMPOTENCY_TTL_SECONDS", 24 * 3600), config.get("IDEMPOTENCY_PENDING_TIMEOUT", 120)
+
+
+def is_recorded_retry():
+    """
+    Whether the current request's Idempotency-Key already has a live record,
+    i.e. the view will not run for it (replay, 409 or 422).
+    """
+    client_key = request.headers.get(HEADER)
+    if not client_key or len(client_key) > MAX_KEY_LENGTH:
+        return False
+    ttl, pending_timeout = _settings()
+    return _get_store().has_record(_request_key(client_key), time.time(), ttl, pending_timeout)
+
+
+def _conflict(status, message, retry_after=None):
+    response = jsonify({"error": message})
+    response.status_code = status
+    if retry_after:
+        response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def idempotent(view):
+    """Honour an Idempotency-Key header on the decorated view."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        client_key = request.headers.get(HEADER)
+        if not client_key:
+            return view(*args, **kwargs)
+        if len(client_key) > MAX_KEY_LENGTH:
+            return _conflict(400, f"{HEADER} must be at most {MAX_KEY_LENGTH} characters")
+
+        key = _request_key(client_key)
+        ttl, pending_timeout = _settings()
+        store = _get_store()
+        decision, recorded = store.begin(key, _fingerprint(), time.time(), ttl, pending_timeout)
+        if decision == REPLAY:
+            status, headers, body = recorded
+            response = current_app.response_class(body, status=status, headers=headers)
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+        if decision == IN_PROGRESS:
+            return _conflict(409, "A request with this Idempotency-Key is still being processed", retry_after=1)
+        if decision == MISMATCH:
+            return _conflict(422, f"{HEADER} was already used for a different request")
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            store.abort(key)
+            raise
+        if response.status_code >= 500 or response.is_streamed:
+            store.abort(key)
+        else:
+            headers = [(k, v) for k, v in response.headers.items() if k in ("Content-Type", "Location")]
+            store.complete(key, (response.status_code, headers, response.get_data()), time.time())
+        return response
+
+    return wrapper
@@ -0,0 +1,356 @@
+# backend/app/image_index.py
+"""
+Perceptual-hash index of submitted upload images.
+
+Every stored upload gets a 64-bit difference hash (dHash). Hashes are kept in
+memory in a multi-index hashing (MIH) structure: the hash is split into m
+chunks and each chunk is indexed separately. By the pigeonhole principle two
+hashes within Hamming distance r share at least one chunk within distance
+r // m, so a lookup only probes a handful of keys per chunk instead of
+scanning every hash.
+
+The bulk of the index is a NumPy segment: the records themselves plus, per
+chunk, the row numbers grouped by chunk value (CSR layout: a uint32 row array
+and a uint32 offset per possible chunk value). A lookup is a few vectorised
+gathers and a popcount over the candidates, with no per-row Python objects.
+The chunk count is chosen from the number of hashes, so the expected number
+of candidates per lookup stays small as the index grows (chunks of roughly
+log2(N) bits). Records added since the segment was built sit in a small tail
+that is scanned linearly and folded into a new segment once it reaches
+DELTA_MAX_RECORDS.
+
+Entries are appended as fixed-size records to `instance/upload_hashes.bin`.
+Each worker replays new records from that file before a lookup (only when
+`os.stat` shows it grew), so hashes added by other workers become visible
+without a shared server. Nothing is read at boot: the first lookup (or the
+readiness warmup thread) loads the file.
+"""
+import logging
+import os
+import struct
+import threading
+from array import array
+from itertools import combinations
+from math import comb
+
+HASH_BITS = 64
+DELTA_MAX_RECORDS = 8192
+MIN_CHUNKS, MAX_CHUNKS = 2, 8
+# Lookup cost model, in units of one candidate checked
+CHUNK_OVERHEAD = 100  # the fixed NumPy calls per chunk
+PROBE_COST = 2
+
+# upload_id, user_id, centre_id (0 = none), hash
+RECORD = struct.Struct("<qqqQ")
+
+logger = logging.getLogger(__name__)
+
+
+def dhash(image_path, hash_size=8):
+    """64-bit difference hash: compares horizontally adjacent pixels of a 9x8 thumbnail."""
+    from PIL import Image
+
+    with Image.open(image_path) as image:
+        # Let the JPEG decoder downscale while decoding; far cheaper than a full decode.
+        image.draft("L", (hash_size * 4, hash_size * 4))
+        thumb = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = thumb.tobytes()  # one byte per pixel in "L" mode
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def nearest_duplicate(matches, user_id, centre_id, before=None):
+    """
+    First (nearest) match submitted by the same user or to the same centre.
+    `before` skips the upload itself and anything submitted after it.
+    """
+    for m in matches:
+        if before is not None and m["upload_id"] >= before:
+            continue
+        same_user = m["user_id"] == user_id
+        if same_user or (centre_id and m["centre_id"] == centre_id):
+            return {"upload_id": m["upload_id"], "distance": m["distance"], "same_user": same_user}
+    return None
+
+
+def chunk_layout(count, max_distance):
+    """
+    (shift, bits) of each chunk for an index of `count` hashes, choosing the
+    chunk count with the lowest estimated lookup cost: probes per chunk plus
+    the candidates they are expected to return. Chunks are kept narrow enough
+    that the offset table (4 bytes per chunk value) stays within a few bytes
+    per hash.
+    """
+    max_bits = max(16, (4 * count).bit_length() - 1)
+    best = None
+    for chunks in range(MIN_CHUNKS, MAX_CHUNKS + 1):
+        bits = HASH_BITS // chunks
+        if -(-HASH_BITS // chunks) > max_bits:
+            continue
+        radius = max_distance // chunks
+        probes = sum(comb(bits, k) for k in range(radius + 1))
+        cost = chunks * (CHUNK_OVERHEAD + probes * PROBE_COST + probes * count / 2 ** bits)
+        if best is None or cost < best[0]:
+            best = (cost, chunks)
+    chunks = best[1]
+    widths = [HASH_BITS // chunks + (1 if i < HASH_BITS % chunks else 0) for i in range(chunks)]
+    return [(sum(widths[:i]), width) for i, width in enumerate(widths)]
+
+
+def _flip_masks(bits, radius, _cache={}):
+    """All `bits`-wide XOR masks with at most `radius` bits set, as a NumPy array."""
+    if (bits, radius) not in _cache:
+        import numpy as np
+
+        masks = [0]
+        for weight in range(1, radius + 1):
+            for positions in combinations(range(bits), weight):
+                mask = 0
+                for bit in positions:
+                    mask |= 1 << bit
+                masks.append(mask)
+        _cache[bits, radius] = np.array(masks, dtype=np.uint32)
+    return _cache[bits, radius]
+
+
+def _popcount(values):
+    import numpy as np
+
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(values)
+    table = _popcount.table
+    if table is None:
+        table = _popcount.table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8).reshape(-1, 8)].sum(axis=1, dtype=np.uint8)
+
+
+_popcount.table = None
+
+
+def _record_dtype():
+    import numpy as np
+
+    return np.dtype([("upload_id", "<i8"), ("user_id", "<i8"), ("centre_id", "<i8"), ("hash", "<u8")])
+
+
+class _Segment:
+    """Immutable MIH index over a NumPy record array."""
+
+    def __init__(self, records, max_distance):
+        import numpy as np
+
+        self.records = records
+        self.hashes = records["hash"]
+        self.layout = chunk_layout(len(records), max_distance)
+        self.tables = []  # per chunk: (offsets by chunk value, row numbers grouped by chunk value)
+        for shift, bits in self.layout:
+            # 16-bit keys get NumPy's radix sort
+            keys = ((self.hashes >> np.uint64(shift)) & np.uint64((1 << bits) - 1)).astype(
+                np.uint16 if bits <= 16 else np.uint32
+            )
+            rows = np.argsort(keys, kind="stable").astype(np.uint32)
+            offsets = np.zeros((1 << bits) + 1, dtype=np.uint32)
+            offsets[1:] = np.cumsum(np.bincount(keys, minlength=1 << bits))
+            self.tables.append((offsets, rows))
+        ids = records["upload_id"]
+        # Upload ids are appended almost always in order; only sort when they are not
+        self.id_order = None if len(ids) < 2 or bool((ids[1:] > ids[:-1]).all()) else np.argsort(ids, kind="stable")
+
+    def __len__(self):
+        return len(self.records)
+
+    def candidates(self, value, max_distance):
+        """Rows that may be within `max_distance` of `value` (a superset, with repeats)."""
+        import numpy as np
+
+        radius = max_distance // len(self.layout)
+        found = []
+        for (shift, bits), (offsets, rows) in zip(self.layout, self.tables):
+            probe = _flip_masks(bits, radius) ^ np.uint32((value >> shift) & ((1 << bits) - 1))
+            lo = offsets[probe].astype(np.int64)
+            lengths = offsets[probe + 1] - lo
+            total = int(lengths.sum())
+            if not total:
+                continue
+            # Concatenate the ranges [lo, lo + length) without a Python loop
+            starts = np.repeat(lo - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+            found.append(rows[starts + np.arange(total)])
+        if not found:
+            return np.empty(0, dtype=np.uint32)
+        return np.concatenate(found)  # a row can come from several chunks
+
+    def position(self, upload_id):
+        import numpy as np
+
+        ids = self.records["upload_id"]
+        if self.id_order is None:
+            pos = int(np.searchsorted(ids, upload_id))
+            return pos if pos < len(ids) and ids[pos] == upload_id else None
+        pos = int(np.searchsorted(ids, upload_id, sorter=self.id_order))
+        if pos < len(ids) and ids[self.id_order[pos]] == upload_id:
+            return int(self.id_order[pos])
+        return None
+
+
+class HashIndex:
+    def __init__(self):
+        self.path = None
+        self.max_distance = 6
+        self.reuse_distance = 2
+        self._lock = threading.Lock()
+        self._reset()
+
+    def init_app(self, app):
+        self.path = app.config.get("PHASH_INDEX_PATH")
+        self.max_distance = app.config.get("PHASH_MAX_DISTANCE", self.max_distance)
+        self.reuse_distance = app.config.get("PHASH_REUSE_DISTANCE", self.reuse_distance)
+        with self._lock:
+            self._reset()
+
+    def __len__(self):
+        return (len(self._segment) if self._segment is not None else 0) + self._delta_count
+
+    def _reset(self):
+        self._offset = 0
+        self._segment = None
+        self._delta = array("Q")  # records added since the segment was built, 4 fields each
+        self._delta_positions = {}  # upload_id -> row in the tail
+
+    @property
+    def _delta_count(self):
+        return len(self._delta) // 4
+
+    def _insert(self, upload_id, user_id, centre_id, value):
+        self._delta_positions[upload_id] = self._delta_count
+        self._delta.extend((upload_id, user_id, centre_id or 0, value))
+        if self._delta_count >= DELTA_MAX_RECORDS:
+            self._merge()
+
+    def _merge(self, data=b""):
+        """Fold the tail (and any raw `data` records) into a new segment (lock held)."""
+        import numpy as np
+
+        dtype = _record_dtype()
+        parts = [np.frombuffer(self._delta.tobytes(), dtype=dtype), np.frombuffer(data, dtype=dtype)]
+        if self._segment is not None:
+            parts.insert(0, self._segment.records)
+        self._segment = _Segment(np.concatenate(parts), self.max_distance)
+        self._delta = array("Q")
+        self._delta_positions = {}
+
+    def _replay(self):
+        """Load records appended to the index file since the last replay (lock held)."""
+        if not self.path:
+            return
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Could not stat image hash index: {e}")
+            return
+        if size < self._offset:
+            logger.warning("Image hash index shrank, reloading it")
+            self._reset()
+        if size - self._offset < RECORD.size:
+            return
+        try:
+            with open(self.path, "rb") as fh:
+                fh.seek(self._offset)
+                data = fh.read(size - self._offset)
+        except OSError as e:
+            logger.warning(f"Could not read image hash index: {e}")
+            return
+        usable = len(data) - len(data) % RECORD.size  # ignore a partially written tail
+        records = memoryview(data)[:usable]
+        if usable // RECORD.size + self._delta_count >= DELTA_MAX_RECORDS:
+            self._merge(records)  # bulk load: straight into a segment
+        else:
+            for record in RECORD.iter_unpack(records):
+                self._insert(*record)
+        self._offset += usable
+
+    def _row(self, upload_id):
+        """(hash, user_id, centre_id) of an indexed upload, or None (lock held)."""
+        pos = self._delta_positions.get(upload_id)
+        if pos is not None:
+            _, user_id, centre_id, value = self._delta[pos * 4: pos * 4 + 4]
+            return value, user_id, centre_id
+        if self._segment is not None:
+            pos = self._segment.position(upload_id)
+            if pos is not None:
+                row = self._segment.records[pos]
+                return int(row["hash"]), int(row["user_id"]), int(row["centre_id"])
+        return None
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def warm(self):
+        """Load the index file now rather than on the first lookup."""
+        with self._lock:
+            self._replay()
+
+    def add(self, upload_id, user_id, centre_id, value):
+        with self._lock:
+            self._replay()
+            if self.path:
+                try:
+                    with open(self.path, "ab") as fh:
+                        fh.write(RECORD.pack(upload_id, user_id, centre_id or 0, value))
+                except OSError as e:
+                    logger.warning(f"Could not persist image hash for upload {upload_id}: {e}")
+                else:
+                    self._replay()
+                    return
+            self._insert(upload_id, user_id, centre_id, value)
+
+    def search(self, value, max_distance=None):
+        """Entries within `max_distance` bits of `value`, nearest first."""
+        max_distance = self.max_distance if max_distance is None else max_distance
+        with self._lock:
+            self._replay()
+            if self._segment is None and not self._delta:
+                return []
+            import numpy as np
+
+            found = []
+            if self._segment is not None:
+                rows = self._segment.candidates(value, max_distance)
+                found.append((self._segment.records, rows, self._segment.hashes[rows]))
+            if self._delta:
+                # A copy, so the array stays resizable; the tail is small
+                records = np.frombuffer(self._delta.tobytes(), dtype=_record_dtype())
+                found.append((records, np.arange(len(records)), records["hash"]))
+            matches = []
+            for records, rows, hashes in found:
+                distances = _popcount(hashes ^ np.uint64(value))
+                near = distances <= max_distance
+                hits, first = np.unique(rows[near], return_index=True)
+                for row, distance in zip(records[hits], distances[near][first]):
+                    matches.append({
+                        "upload_id": int(row["upload_id"]),
+                        "user_id": int(row["user_id"]),
+                        "centre_id": int(row["centre_id"]) or None,
+                        "distance": int(distance),
+                    })
+        matches.sort(key=lambda m: (m["distance"], m["upload_id"]))
+        return matches
+
+    def duplicate_of(self, upload_id):
+        """Nearest earlier near-duplicate of an indexed upload (same user or centre), or None."""
+        with self._lock:
+            self._replay()
+            row = self._row(upload_id)
+        if row is None:
+            return None
+        value, user_id, centre_id = row
+        return nearest_duplicate(self.search(value), user_id, centre_id or None, before=upload_id)
+
+
+image_index = HashIndex()
@@ -0,0 +1,284 @@
+# backend/app/leaderboard.py
+"""
+Incrementally maintained points leaderboards.
+
+Each board (scope x period) keeps the running points per user plus a small
+sorted top-K list. Points only ever increase, so a user outside the top-K can
+only enter it by overtaking the current K-th entry; that keeps updates at
+O(K log K) and reads at O(K) no matter how many users or uploads exist.
+
+State lives in memory. When it goes stale it is rebuilt in a background
+thread from one aggregate query per period (so credits made by other workers
+converge) while readers keep getting the previous boards. A timer thread
+snapshots it to `instance/leaderboard.json` so a fresh worker does not need to
+hit the DB.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+SCOPES = ("global", "centre")
+PERIODS = ("week", "month", "all")
+
+logger = logging.getLogger(__name__)
+
+
+def period_key(period, when):
+    """Bucket key a timestamp falls into for the given period."""
+    if period == "week":
+        year, week, _ = when.isocalendar()
+        return f"week:{year}-W{week:02d}"
+    if period == "month":
+        return f"month:{when.year}-{when.month:02d}"
+    return "all"
+
+
+def period_start(period, now):
+    if period == "week":
+        start = now - timedelta(days=now.weekday())
+        return start.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "month":
+        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return None
+
+
+class TopK:
+    """Running scores for every user plus an ordered top-K of user ids."""
+
+    def __init__(self, k):
+        self.k = k
+        self.scores = {}
+        self.top = []
+
+    def add(self, user_id, points):
+        self.scores[user_id] = self.scores.get(user_id, 0) + points
+        if user_id not in self.top:
+            if len(self.top) >= self.k and self._rank_key(user_id) > self._rank_key(self.top[-1]):
+                return
+            self.top.append(user_id)
+        self.top.sort(key=self._rank_key)
+        del self.top[self.k:]
+
+    def _rank_key(self, user_id):
+        return -self.scores[user_id], user_id
+
+    def items(self, limit=None):
+        return [(uid, self.scores[uid]) for uid in self.top[:limit or self.k]]
+
+
+class Leaderboard:
+    def __init__(self):
+        self.size = 10
+        self.resync_seconds = 300
+        self.snapshot_seconds = 60
+        self.snapshot_path = None
+        self._app = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._boards = {}
+        self._names = {}
+        self._built_at = 0.0
+        self._dirty = False
+        self._snapshot_thread = None
+
+    def init_app(self, app):
+        self._app = app
+        self.size = app.config.get("LEADERBOARD_SIZE", self.size)
+        self.resync_seconds = app.config.get("LEADERBOARD_RESYNC_SECONDS", self.resync_seconds)
+        self.snapshot_seconds = app.config.get("LEADERBOARD_SNAPSHOT_SECONDS", self.snapshot_seconds)
+        self.snapshot_path = app.config.get("LEADERBOARD_SNAPSHOT_PATH")
+        self._load_snapshot()
+
+    # ----------------------------
+    # Reads
+    # ----------------------------
+    def top(self, scope="global", period="all", centre_id=None, limit=None, now=None):
+        now = now or datetime.utcnow()
+        if not self._built_at:
+            # Nothing to serve yet (no snapshot): the first reader builds, the rest wait for it
+            with self._refresh_lock:
+                if not self._built_at:
+                    self.rebuild(now)
+        elif time.time() - self._built_at > self.resync_seconds:
+            self._refresh_in_background()
+        key = (scope, centre_id if scope == "centre" else None, period_key(period, now))
+        with self._lock:
+            board = self._boards.get(key)
+            if board is None:
+                return []
+            return [
+                {"rank": rank, "user_id": uid, "user_name": self._names.get(uid), "points": points}
+                for rank, (uid, points) in enumerate(board.items(limit), start=1)
+            ]
+
+    # ----------------------------
+    # Writes
+    # ----------------------------
+    def record(self, user_id, points, centre_id=None, user_name=None, when=None):
+        """Credit `points` to a user on every board the submission counts towards."""
+        if not points:
+            return
+        now = datetime.utcnow()
+        when = when or now
+        with self._lock:
+            if user_name:
+                self._names[user_id] = user_name
+            for period in PERIODS:
+                key = period_key(period, when)
+                if key != period_key(period, now):
+                    continue  # credited into a bucket that is no longer current
+                self._board("global", None, key).add(user_id, points)
+                if centre_id:
+                    self._board("centre", centre_id, key).add(user_id, points)
+            self._dirty = True
+        self._ensure_snapshot_timer()
+
+    def _refresh_in_background(self):
+        """Start one rebuild thread unless one is already running; never blocks the caller."""
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        app = self._app
+
+        def run():
+            try:
+                if app is not None:
+                    with app.app_context():
+                        self.rebuild()
+                else:
+                    self.rebuild()
+            except Exception:
+                logger.exception("Leaderboard rebuild failed")
+                with self._lock:
+                    self._built_at = time.time()  # keep serving old data; retry after another interval
+            finally:
+                self._refresh_lock.release()
+
+        threading.Thread(target=run, name="leaderboard-rebuild", daemon=True).start()
+
+    def rebuild(self, now=None):
+        """Recompute every current board with one grouped query per period (plus the archive for all-time)."""
+        from app.archive import archived_points
+        from app.extensions import db
+        from app.models.uploads import Upload
+        from app.models.user import User
+
+        now = now or datetime.utcnow()
+        boards, names = {}, {}
+        for period in PERIODS:
+            key = period_key(period, now)
+            query = (
+                db.session.query(Upload.user_id, Upload.centre_id, User.user_name, func.sum(Upload.points_awarded))
+                .join(User, User.id == Upload.user_id)
+                .filter(Upload.not_verified.is_(False))
+            )
+            start = period_start(period, now)
+            if start is not None:
+                query = query.filter(Upload.upload_date >= start)
+            query = query.group_by(Upload.user_id, Upload.centre_id, User.user_name)
+            rows = list(query)
+            if period == "all":
+                rows.extend((user_id, centre_id, None, points) for user_id, centre_id, points in archived_points())
+            for user_id, centre_id, user_name, points in rows:
+                if not points:
+                    continue
+                if user_name:
+                    names[user_id] = user_name
+                boards.setdefault(("global", None, key), TopK(self.size)).add(user_id, points)
+                if centre_id:
+                    boards.setdefault(("centre", centre_id, key), TopK(self.size)).add(user_id, points)
+
+        # Users whose verified uploads are all archived still need a display name
+        missing = {uid for board in boards.values() for uid in board.top} - names.keys()
+        if missing:
+            names.update(db.session.query(User.id, User.user_name).filter(User.id.in_(missing)))
+
+        with self._lock:
+            self._boards = boards
+            self._names = names
+            self._built_at = time.time()
+            self._dirty = True
+        self._ensure_snapshot_timer()
+
+    def _board(self, scope, centre_id, key):
+        board = self._boards.get((scope, centre_id, key))
+        if board is None:
+            board = self._boards[(scope, centre_id, key)] = TopK(self.size)
+        return board
+
+    # ----------------------------
+    # Snapshots
+    # ----------------------------
+    def _ensure_snapshot_timer(self):
+        """Snapshots are written off the request path, at most every `snapshot_seconds`."""
+        if not self.snapshot_path:
+            return
+        thread = self._snapshot_thread
+        if thread is not None and thread.is_alive():
+            return
+        with self._lock:
+            if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+                return
+            self._snapshot_thread = threading.Thread(target=self._snapshot_loop, name="leaderboard-snapshot", daemon=True)
+            self._snapshot_thread.start()
+
+    def _snapshot_loop(self):
+        while True:
+            time.sleep(self.snapshot_seconds)
+            if self._dirty:
+                self._write_snapshot()
+
+    def _write_snapshot(self):
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            data = {
+                "built_at": self._built_at,
+                "names": {str(uid): name for uid, name in self._names.items()},
+                "boards": [
+                    {"scope": scope, "centre_id": centre_id, "key": key, "scores": list(board.scores.items())}
+                    for (scope, centre_id, key), board in self._boards.items()
+                ],
+            }
+            self._dirty = False
+        # Unique temp file per writer, so workers never interleave into the same file
+        directory = os.path.dirname(self.snapshot_path) or "."
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".leaderboard-", suffix=".tmp")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(data, fh)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"Could not write leaderboard snapshot: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable leaderboard snapshot: {e}")
+            return
+
+        boards = {}
+        for entry in data.get("boards", []):
+            board = TopK(self.size)
+            for uid, points in entry["scores"]:
+                board.add(uid, points)
+            boards[(entry["scope"], entry["centre_id"], entry["key"])] = board
+        with self._lock:
+            self._boards = boards
+            self._names = {int(uid): name for uid, name in data.get("names", {}).items()}
+            self._built_at = data.get("built_at", 0.0)
+
+
+leaderboard = Leaderboard()
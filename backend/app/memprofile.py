@@ -0,0 +1,190 @@
+# backend/app/memprofile.py
+"""
+Opt-in memory instrumentation and RSS-based worker recycling.
+
+With MEMPROFILE_ENABLED:
+  * tracemalloc runs for the whole process; every MEMPROFILE_SNAPSHOT_EVERY
+    requests a snapshot is diffed against the previous one and the biggest
+    growth sites are logged;
+  * a sample of requests (MEMPROFILE_SAMPLE_RATE) records traced peak memory
+    per endpoint (process-wide, so concurrent requests inflate each other);
+  * GET /admin/memory (X-Admin-Token: MEMPROFILE_ADMIN_TOKEN) and SIGUSR2 dump
+    the top allocation sites.
+
+Independently, WORKER_MAX_RSS_MB makes a worker exit gracefully after finishing
+the current response once its RSS passes the threshold, so the process
+manager (gunicorn) replaces it with a fresh one.
+"""
+import hmac
+import logging
+import os
+import random
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+
+from flask import Blueprint, current_app, g, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+memory_bp = Blueprint("memory", __name__, url_prefix="/admin")
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # Peak rather than current RSS on platforms without /proc
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class MemoryProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.snapshot_every = 500
+        self.sample_rate = 0.1
+        self.frames = 10
+        self.max_rss = None
+        self.rss_check_every = 50
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._baseline = None
+        self._peaks = {}
+        self._recycling = False
+
+    def init_app(self, app):
+        self.enabled = app.config.get("MEMPROFILE_ENABLED", False)
+        self.snapshot_every = app.config.get("MEMPROFILE_SNAPSHOT_EVERY", self.snapshot_every)
+        self.sample_rate = app.config.get("MEMPROFILE_SAMPLE_RATE", self.sample_rate)
+        self.frames = app.config.get("MEMPROFILE_TRACEBACK_FRAMES", self.frames)
+        max_rss_mb = app.config.get("WORKER_MAX_RSS_MB")
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.rss_check_every = app.config.get("WORKER_RSS_CHECK_EVERY", self.rss_check_every)
+
+        if not self.enabled and not self.max_rss:
+            return
+
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._baseline = tracemalloc.take_snapshot()
+            self._install_signal_handler()
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _install_signal_handler(self):
+        if not hasattr(signal, "SIGUSR2"):
+            return
+        try:
+            signal.signal(signal.SIGUSR2, lambda signum, frame: self.log_top())
+        except ValueError:
+            pass  # not in the main thread (e.g. created inside a worker thread)
+
+    # ----------------------------
+    # Request hooks
+    # ----------------------------
+    def _before_request(self):
+        if self.enabled and random.random() < self.sample_rate:
+            tracemalloc.reset_peak()
+            g.memprofile_start = tracemalloc.get_traced_memory()[0]
+
+    def _after_request(self, response):
+        start = g.pop("memprofile_start", None)
+        if start is not None:
+            peak = tracemalloc.get_traced_memory()[1] - start
+            with self._lock:
+                stats = self._peaks.setdefault(request.endpoint, {"samples": 0, "max_peak": 0, "total_peak": 0})
+                stats["samples"] += 1
+                stats["max_peak"] = max(stats["max_peak"], peak)
+                stats["total_peak"] += peak
+
+        with self._lock:
+            self._requests += 1
+            count = self._requests
+        if self.enabled and count % self.snapshot_every == 0:
+            self.log_growth()
+        if self.max_rss and count % self.rss_check_every == 0:
+            self._maybe_recycle(response)
+        return response
+
+    # ----------------------------
+    # Reports
+    # ----------------------------
+    def top_sites(self, limit=25):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        return [
+            {"site": str(stat.traceback[0]), "size": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:limit]
+        ]
+
+    def log_top(self, limit=25):
+        for site in self.top_sites(limit):
+            logger.warning(f"memprofile top: {site['size'] / 1024:.1f} KiB in {site['count']} blocks at {site['site']}")
+
+    def log_growth(self, limit=10):
+        snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            baseline, self._baseline = self._baseline, snapshot
+        if baseline is None:
+            return
+        for diff in snapshot.compare_to(baseline, "lineno")[:limit]:
+            if diff.size_diff > 0:
+                logger.warning(f"memprofile growth: +{diff.size_diff / 1024:.1f} KiB at {diff.traceback[0]}")
+
+    def endpoint_peaks(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    "samples": s["samples"],
+                    "max_peak_bytes": s["max_peak"],
+                    "avg_peak_bytes": s["total_peak"] // s["samples"],
+                }
+                for endpoint, s in self._peaks.items()
+            }
+
+    # ----------------------------
+    # Worker recycling
+    # ----------------------------
+    def _maybe_recycle(self, response):
+        rss = current_rss_bytes()
+        if rss < self.max_rss or self._recycling:
+            return
+        self._recycling = True
+        logger.warning(f"Worker {os.getpid()} RSS {rss / 1024 / 1024:.0f} MiB over limit, recycling after this response")
+        if "gunicorn" in sys.modules:
+            # SIGTERM is a graceful stop for a gunicorn worker; the arbiter starts a replacement
+            response.call_on_close(lambda: os.kill(os.getpid(), signal.SIGTERM))
+
+
+memory_profiler = MemoryProfiler()
+
+
+@memory_bp.route("/memory", methods=["GET"])
+def memory_report():
+    """Top allocation sites, RSS and per-endpoint peaks (admin token required)."""
+    token = current_app.config.get("MEMPROFILE_ADMIN_TOKEN")
+    if not memory_profiler.enabled or not token:
+        return jsonify({"error": "Not Found"}), 404
+    # Compare bytes: compare_digest raises TypeError on non-ASCII str
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), token.encode()):
+        return jsonify({"error": "Forbidden"}), 403
+
+    limit = request.args.get("limit", default=25, type=int)
+    current, peak = tracemalloc.get_traced_memory()
+    return jsonify({
+        "pid": os.getpid(),
+        "timestamp": time.time(),
+        "rss_bytes": current_rss_bytes(),
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "top_sites": memory_profiler.top_sites(limit),
+        "endpoint_peaks": memory_profiler.endpoint_peaks(),
+    }), 200
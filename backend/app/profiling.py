@@ -0,0 +1,147 @@
+# backend/app/profiling.py
+"""
+Startup profiler: `flask profile-startup`.
+
+Boots the app in a fresh interpreter (so nothing is already imported) under
+`python -X importtime` and tracemalloc, then reports import time and memory
+per top-level package, the time spent in create_app(), and which heavy
+dependencies got pulled in. `--budget` turns it into a gate that fails when
+booting takes too long or loads the model eagerly.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Should only be imported by the code paths that use them
+HEAVY_MODULES = ("torch", "transformers", "onnxruntime", "PIL", "numpy", "pyarrow", "cloudinary")
+MODEL_MODULES = ("torch", "transformers", "onnxruntime", "ai.create_model")
+
+_PROBE = """
+import json, os, resource, sys, time, tracemalloc
+if {trace_memory!r}:
+    tracemalloc.start()
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+if {with_model!r}:
+    import ai.create_model
+    if ai.create_model.client is None:
+        ai.create_model.get_classifier()
+t3 = time.perf_counter()
+
+backend = {backend!r}
+by_package = {{}}
+for stat in tracemalloc.take_snapshot().statistics("filename") if tracemalloc.is_tracing() else ():
+    path = stat.traceback[0].filename
+    if "site-packages" in path:
+        package = path.split("site-packages" + os.sep, 1)[1].split(os.sep, 1)[0]
+    elif path.startswith(backend):
+        package = os.path.relpath(path, backend).split(os.sep, 1)[0]
+    else:
+        package = "<stdlib>"
+    package = package.split(".py")[0]
+    by_package[package] = by_package.get(package, 0) + stat.size
+
+print(json.dumps({{
+    "import_app_s": t1 - t0,
+    "create_app_s": t2 - t1,
+    "model_s": t3 - t2,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+    "traced_bytes": tracemalloc.get_traced_memory()[0],
+    "memory_by_package": by_package,
+    "loaded": sorted(sys.modules),
+}}))
+"""
+
+
+def _parse_importtime(stderr):
+    """Cumulative microseconds per top-level package from `-X importtime` output."""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, raw_name = line[len("import time:"):].split("|")
+        cumulative = cumulative.strip()
+        # Nesting is shown as indentation; only count outermost imports so
+        # children are not added twice.
+        if not cumulative.isdigit() or len(raw_name) - len(raw_name.lstrip()) > 1:
+            continue
+        top = raw_name.strip().split(".")[0]
+        totals[top] = totals.get(top, 0) + int(cumulative)
+    return totals
+
+
+def profile_startup(with_model=False, trace_memory=True):
+    """
+    Boot the app in a fresh interpreter and return its report. Tracing memory
+    slows imports down several times over, so pass `trace_memory=False` when
+    only the timings matter.
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(with_model=with_model, trace_memory=trace_memory, backend=BACKEND_DIR)],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise click.ClickException(f"App failed to boot:\n{proc.stderr[-2000:]}")
+    report = json.loads(proc.stdout.strip().splitlines()[-1])
+    report["import_us_by_package"] = _parse_importtime(proc.stderr)
+    return report
+
+
+@click.command("profile-startup")
+@click.option("--top", default=15, show_default=True, help="Number of packages to list.")
+@click.option("--with-model", is_flag=True, help="Also load the classifier (unless INFERENCE_SOCKET_PATH is set).")
+@click.option("--budget", type=float, default=None, is_flag=False, flag_value=-1.0,
+              help="Fail if import + create_app() exceeds this many seconds (bare flag uses STARTUP_BUDGET_SECONDS) "
+                   "or if the model is loaded during boot.")
+@with_appcontext
+def profile_startup_command(top, with_model, budget):
+    """Report per-package import time and memory for booting the app."""
+    report = profile_startup(with_model=with_model)
+
+    click.echo(f"{'package':<28} {'import ms':>10} {'memory KiB':>11}")
+    imports = report["import_us_by_package"]
+    memory = report["memory_by_package"]
+    for package in sorted(imports, key=imports.get, reverse=True)[:top]:
+        click.echo(f"{package:<28} {imports[package] / 1000:>10.1f} {memory.get(package, 0) / 1024:>11.1f}")
+
+    boot_s = report["import_app_s"] + report["create_app_s"]
+    click.echo("")
+    click.echo(f"import app:   {report['import_app_s'] * 1000:8.1f} ms")
+    click.echo(f"create_app(): {report['create_app_s'] * 1000:8.1f} ms")
+    if with_model:
+        click.echo(f"model load:   {report['model_s'] * 1000:8.1f} ms")
+    click.echo(f"peak RSS +{report['rss_kb'] / 1024:.1f} MiB, traced {report['traced_bytes'] / 1024 / 1024:.1f} MiB")
+    heavy = [m for m in HEAVY_MODULES if m in report["loaded"]]
+    click.echo(f"heavy modules loaded: {', '.join(heavy) or 'none'}")
+
+    if budget is None:
+        return
+    if budget < 0:
+        budget = current_app.config.get("STARTUP_BUDGET_SECONDS", 3.0)
+    # Judge the budget on a boot without tracemalloc, which inflates import time
+    untraced = profile_startup(with_model=with_model, trace_memory=False)
+    boot_s = untraced["import_app_s"] + untraced["create_app_s"]
+    failures = []
+    if boot_s > budget:
+        failures.append(f"boot took {boot_s:.2f}s, budget is {budget:.2f}s")
+    eager = [m for m in MODEL_MODULES if m in report["loaded"]]
+    if eager and not with_model:
+        failures.append(f"model dependencies imported during boot: {', '.join(eager)}")
+    if failures:
+        raise click.ClickException("; ".join(failures))
+    click.echo(f"OK: boot {boot_s:.2f}s within {budget:.2f}s budget, model not loaded")
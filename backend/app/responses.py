@@ -0,0 +1,89 @@
+# backend/app/responses.py
+"""
+App-wide response layer: fast JSON encoding, negotiated compression and an
+optional columnar shape for large list payloads.
+"""
+import gzip
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "text/csv", "text/html", "text/plain"}
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson; datetimes are emitted as ISO 8601."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if self._app.debug:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(f"{self.dumps(obj)}\n", mimetype=self.mimetype)
+
+
+def rows_payload(rows):
+    """
+    Return `rows` as-is, or as {"columns": [...], "rows": [[...], ...]} when the
+    client asks for `?shape=columns`, so repeated keys are sent only once.
+    """
+    if request.args.get("shape") != "columns":
+        return rows
+    columns = list(rows[0].keys()) if rows else []
+    return {"columns": columns, "rows": [[row[c] for c in columns] for row in rows]}
+
+
+def _compress_response(app, response):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < app.config.get("COMPRESS_MIN_SIZE", 1024):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(["br", "gzip"] if brotli else ["gzip"])
+    if encoding == "br":
+        data = brotli.compress(data, quality=app.config.get("COMPRESS_BROTLI_QUALITY", 4))
+    elif encoding == "gzip":
+        data = gzip.compress(data, compresslevel=app.config.get("COMPRESS_GZIP_LEVEL", 6))
+    else:
+        return response
+
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_responses(app):
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+    else:
+        app.logger.info("orjson not installed; using the stdlib JSON encoder")
+
+    @app.after_request
+    def compress(response):
+        return _compress_response(app, response)
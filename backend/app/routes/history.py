@@ -1,9 +1,12 @@
 from flask import Blueprint, request, jsonify
 from app.models.uploads import Upload
+from app.responses import rows_payload
+from app.coalesce import coalesce
 
 history_bp = Blueprint("history", __name__, url_prefix="/uploads/history")
 
 @history_bp.route("/", methods=["GET"])
+@coalesce(scope="public")
 def get_user_history():
     user_id = request.args.get("user_id", type=int)
     if not user_id:
@@ -26,4 +29,4 @@ def get_user_history():
             "upload_date": u.upload_date.isoformat()
         })
 
-    return jsonify({"submissions": submissions}), 200
+    return jsonify({"submissions": rows_payload(submissions)}), 200
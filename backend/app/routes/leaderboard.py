@@ -0,0 +1,34 @@
+# backend/app/routes/leaderboard.py
+from flask import Blueprint, request, jsonify
+
+from app.leaderboard import leaderboard, SCOPES, PERIODS
+from app.coalesce import coalesce
+
+leaderboard_bp = Blueprint("leaderboard", __name__, url_prefix="/api/leaderboard")
+
+
+@leaderboard_bp.route("/", methods=["GET"])
+@coalesce(scope="public")
+def get_leaderboard():
+    """Top contributors by verified points, optionally per centre and period."""
+    scope = (request.args.get("scope") or "global").lower()
+    period = (request.args.get("period") or "all").lower()
+    centre_id = request.args.get("centre_id", type=int)
+    limit = request.args.get("limit", type=int)
+
+    if scope not in SCOPES:
+        return jsonify({"error": f"Invalid scope, use one of: {', '.join(SCOPES)}"}), 400
+    if period not in PERIODS:
+        return jsonify({"error": f"Invalid period, use one of: {', '.join(PERIODS)}"}), 400
+    if scope == "centre" and not centre_id:
+        return jsonify({"error": "centre_id is required for scope=centre"}), 400
+    if limit is not None and limit < 1:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+
+    leaders = leaderboard.top(scope=scope, period=period, centre_id=centre_id, limit=limit)
+    return jsonify({
+        "scope": scope,
+        "period": period,
+        "centre_id": centre_id if scope == "centre" else None,
+        "leaders": leaders,
+    }), 200
@@ -1,33 +1,75 @@
 # uploads_bp.py
-from pathlib import Path
-from flask import Blueprint, request, jsonify, current_app, send_from_directory, session
-from werkzeug.utils import secure_filename
+from flask import Blueprint, request, jsonify, current_app, session, Response, stream_with_context
 from app.extensions import db
+from app.leaderboard import leaderboard
+from app.image_index import image_index, dhash, nearest_duplicate
+from app.responses import rows_payload
+from app.events import broker
+from app.archive import iter_archived
+from app.export import EXPORT_FORMATS, parse_date_arg, export_lines, gzip_chunks
+from app.coalesce import coalesce, invalidate
+from app.idempotency import idempotent
+from app.storage import storage, is_valid_key
 from app.models.uploads import Upload
 from app.models.centers import centers as CentersModel
 from app.models.user import User  # needed for approve_upload
-from ai.create_model import predict
-import os
+import itertools
+import json
 
 uploads_bp = Blueprint("uploads", __name__, url_prefix="/uploads")
 
-UPLOAD_FOLDER = Path("uploads")
-UPLOAD_FOLDER.mkdir(exist_ok=True)
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "bmp", "gif"}
 
+EXPORT_BATCH_SIZE = 1000
+STREAM_KEEPALIVE_SECONDS = 15
+# Coalesced reads whose results change when an upload is created or approved
+UPLOAD_LIST_ENDPOINTS = ("uploads.get_user_uploads", "uploads.get_all_uploads")
+
 
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-# Serve uploaded images
+def _find_duplicate(image_hash, user_id, centre_id):
+    """
+    Look up near-duplicate submissions for a perceptual hash.
+
+    Returns (duplicate, reusable): `duplicate` describes the nearest earlier
+    submission by the same user or to the same centre, `reusable` is a verified
+    near-identical Upload whose classification can be reused instead of
+    running the model again.
+    """
+    matches = image_index.search(image_hash)
+    if not matches:
+        return None, None
+
+    duplicate = nearest_duplicate(matches, user_id, centre_id)
+
+    reusable = None
+    near_ids = [m["upload_id"] for m in matches if m["distance"] <= image_index.reuse_distance][:5]
+    if near_ids:
+        verified = {
+            u.id: u for u in Upload.query.filter(Upload.id.in_(near_ids), Upload.not_verified.is_(False))
+        }
+        reusable = next((verified[i] for i in near_ids if i in verified), None)
+
+    return duplicate, reusable
+
+
+# Serve uploaded images (content-addressed; supports Range and conditional GETs)
 @uploads_bp.route("/<filename>")
 def uploaded_file(filename):
-    return send_from_directory(str(UPLOAD_FOLDER), filename)
+    if not is_valid_key(filename):
+        return jsonify({"error": "Not Found"}), 404
+    try:
+        return storage.send(filename)
+    except FileNotFoundError:
+        return jsonify({"error": "Not Found"}), 404
 
 
 # --- POST: Upload + AI classification ---
 @uploads_bp.route("/", methods=["POST"])
+@idempotent
 def upload_file():
     user_id = session.get("user_id")
     user_name = session.get("user_name") or "anonymous"
@@ -40,39 +82,69 @@ def upload_file():
     if not allowed_file(file.filename):
         return jsonify({"error": "Unsupported file type"}), 400
 
-    filename = secure_filename(file.filename)
-    filepath = UPLOAD_FOLDER / filename
-    file.save(filepath)
+    weight = request.form.get("weight", type=float)
+    centre_id = request.form.get("centre_id", type=int)
+    preview = request.form.get("preview", type=lambda v: v.lower() == "true")
 
+    # Spooled to local disk and hashed; only committed to storage on submit
+    staged = storage.stage(file, file.filename.rsplit(".", 1)[1])
     try:
-        prediction = predict(str(filepath))
-        category = prediction.get("category", "unknown")
-        confidence = float(prediction.get("confidence", 0.0))
-        points_awarded = int(confidence * 100)
+        return _classify_and_save(staged, user_id, user_name, weight, centre_id, preview)
+    finally:
+        storage.discard(staged)
+
+
+def _classify_and_save(staged, user_id, user_name, weight, centre_id, preview):
+    filepath = staged.path
+
+    # Perceptual-hash lookup: flag resubmissions and skip inference when a
+    # verified near-identical image has already been classified.
+    image_hash, duplicate, reusable = None, None, None
+    try:
+        image_hash = dhash(filepath)
+        duplicate, reusable = _find_duplicate(image_hash, user_id, centre_id)
     except Exception as e:
-        current_app.logger.error(f"AI prediction failed: {e}")
-        category, confidence, points_awarded = "unknown", 0.0, 0
+        current_app.logger.warning(f"Image hash lookup failed: {e}")
+
+    if reusable is not None:
+        category, confidence = reusable.category, float(reusable.confidence or 0.0)
+        points_awarded = int(confidence * 100)
+        stage = "reused"
+    else:
+        try:
+            # Imported here so the model (torch/transformers) only loads when
+            # an upload actually needs classifying, not on every app boot.
+            from ai.create_model import predict
+
+            prediction = predict(filepath)
+            category = prediction.get("category", "unknown")
+            confidence = float(prediction.get("confidence", 0.0))
+            points_awarded = int(confidence * 100)
+            stage = prediction.get("stage")
+        except Exception as e:
+            current_app.logger.error(f"AI prediction failed: {e}")
+            category, confidence, points_awarded, stage = "unknown", 0.0, 0, None
+
+    if duplicate and duplicate["same_user"]:
+        points_awarded = 0  # no points for resubmitting the same photo
 
-    preview = request.form.get("preview", type=lambda v: v.lower() == "true")
     if preview:
-        if filepath.exists():
-            filepath.unlink()
         return jsonify({
-            "upload": {"category": category, "confidence": confidence, "points_awarded": points_awarded}
+            "upload": {"category": category, "confidence": confidence, "points_awarded": points_awarded, "stage": stage},
+            "duplicate": duplicate,
         }), 200
 
-    weight = request.form.get("weight", type=float)
-    centre_id = request.form.get("centre_id", type=int)
-
     if centre_id:
         centre = CentersModel.query.get(centre_id)
         if not centre:
             return jsonify({"error": "Center not found"}), 404
 
+    storage.commit(staged)
+
     upload = Upload(
         user_id=user_id,
         user_name=user_name,
-        filename_url=filename,
+        filename_url=staged.key,
         weight=weight,
         centre_id=centre_id,
         category=category,
@@ -81,9 +153,12 @@ def upload_file():
     )
     db.session.add(upload)
     db.session.commit()
+    invalidate(*UPLOAD_LIST_ENDPOINTS)
+
+    if image_hash is not None:
+        image_index.add(upload.id, user_id, centre_id, image_hash)
 
-    if filepath.exists():
-        filepath.unlink()
+    broker.publish("upload.created", dict(_upload_row(upload), duplicate=duplicate), centre_id=upload.centre_id)
 
     return jsonify({"upload": {
         "id": upload.id,
@@ -93,11 +168,13 @@ def upload_file():
         "weight": upload.weight,
         "centre_id": upload.centre_id,
         "upload_date": upload.upload_date.isoformat(),
-    }}), 201
+        "stage": stage,
+    }, "duplicate": duplicate}), 201
 
 
 # --- GET: User uploads ---
 @uploads_bp.route("/", methods=["GET"])
+@coalesce(scope="user")
 def get_user_uploads():
     user_id = session.get("user_id")
     if not user_id:
@@ -118,10 +195,11 @@ def get_user_uploads():
         "upload_date": u.upload_date.isoformat(),
     } for u in uploads_query]
 
-    return jsonify({"uploads": uploads}), 200
+    return jsonify({"uploads": rows_payload(uploads)}), 200
 
 
 @uploads_bp.route("/all", methods=["GET"])
+@coalesce(scope="role")
 def get_all_uploads():
     # role = session.get("role")
     # if role != "corporative":
@@ -145,13 +223,165 @@ def get_all_uploads():
         "centre_id": u.centre_id,
         "not_verified": u.not_verified,
         "upload_date": u.upload_date.isoformat(),
+        # Flag near-duplicate resubmissions for the reviewer; only pending rows need it
+        "duplicate": image_index.duplicate_of(u.id) if u.not_verified else None,
     } for u in query]
 
-    return jsonify({"uploads": uploads, "count": len(uploads)}), 200
+    # Archived uploads are all verified and older than anything live
+    if not_verified is None or not is_not_verified:
+        archived = [dict(_archived_row(row), duplicate=None) for row in iter_archived()]
+        archived.sort(key=lambda row: row["upload_date"] or "", reverse=True)
+        uploads.extend(archived)
 
+    return jsonify({"uploads": rows_payload(uploads), "count": len(uploads)}), 200
+
+
+def _export_scope(user_id, role, centre_id):
+    """
+    Which rows the caller may export. Returns (centre_ids, own_user_id, error).
+
+    Corporate users export submissions to the centres they created (optionally
+    narrowed to one of them); everyone else only their own submissions.
+    """
+    if role != "corporative":
+        return ([centre_id] if centre_id else None), user_id, None
+    owned = [c.id for c in CentersModel.query.filter_by(created_by=user_id)]
+    if centre_id:
+        if centre_id not in owned:
+            return None, None, "You can only export submissions to your own centres."
+        return [centre_id], None, None
+    return owned, None, None
+
+
+def _upload_row(u):
+    return {
+        "id": u.id,
+        "user_id": u.user_id,
+        "user_name": u.user_name,
+        "filename_url": u.filename_url,
+        "category": u.category,
+        "confidence": u.confidence,
+        "points_awarded": u.points_awarded,
+        "weight": u.weight,
+        "centre_id": u.centre_id,
+        "not_verified": u.not_verified,
+        "upload_date": u.upload_date.isoformat() if u.upload_date else None,
+    }
+
+
+def _archived_row(row):
+    row["upload_date"] = row["upload_date"].isoformat() if row["upload_date"] else None
+    return row
+
+
+# --- GET: Streaming export (CSV / NDJSON) ---
+@uploads_bp.route("/export", methods=["GET"])
+def export_uploads():
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "You must be logged in to export uploads."}), 401
+
+    fmt = (request.args.get("format") or "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format, use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    centre_id = request.args.get("centre_id", type=int)
+    date_from, error = parse_date_arg("from")
+    if error:
+        return jsonify({"error": error}), 400
+    date_before, error = parse_date_arg("to", end=True)
+    if error:
+        return jsonify({"error": error}), 400
+
+    centre_ids, own_user_id, error = _export_scope(user_id, session.get("role"), centre_id)
+    if error:
+        return jsonify({"error": error}), 403
+
+    query = Upload.query
+    if centre_ids is not None:
+        query = query.filter(Upload.centre_id.in_(centre_ids))
+    if own_user_id is not None:
+        query = query.filter(Upload.user_id == own_user_id)
+    if date_from:
+        query = query.filter(Upload.upload_date >= date_from)
+    if date_before:
+        query = query.filter(Upload.upload_date < date_before)
+    # yield_per streams rows in fixed-size batches (server-side cursor where the
+    # driver supports it) instead of materialising the whole result set.
+    query = query.order_by(Upload.id.asc()).yield_per(EXPORT_BATCH_SIZE)
+
+    # Archived (older) rows first, then the live table, so output stays in id order
+    archived = (
+        _archived_row(row)
+        for row in iter_archived(centre_ids, own_user_id, date_from, date_before, EXPORT_BATCH_SIZE)
+    )
+    live = (_upload_row(u) for u in query)
+    body = export_lines(itertools.chain(archived, live), fmt)
+    headers = {
+        "Content-Disposition": f'attachment; filename="uploads-export.{fmt}"',
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+    }
+    if request.accept_encodings.best_match(["gzip"]):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers=headers,
+    )
+
+
+def _sse(event_type, data, event_id=None):
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+# --- GET: Server-sent events feed of new / approved uploads ---
+@uploads_bp.route("/stream", methods=["GET"])
+def stream_uploads():
+    if not session.get("user_id"):
+        return jsonify({"error": "You must be logged in to follow uploads."}), 401
+
+    centre_id = request.args.get("centre_id", type=int)
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    cursor = broker.parse_event_id(last_event_id) if last_event_id else broker.cursor()
+    if cursor is None:
+        cursor = broker.cursor()
+        resync = True  # cannot replay what was missed; client must reload the list
+    else:
+        resync = False
+
+    def generate():
+        nonlocal cursor
+        yield "retry: 3000\n\n"
+        if resync:
+            yield _sse("resync", {"reason": "history unavailable"}, broker.event_id(cursor))
+        while True:
+            if not broker.wait(cursor, STREAM_KEEPALIVE_SECONDS):
+                yield ": keepalive\n\n"
+                continue
+            events, new_cursor = broker.since(cursor, centre_id)
+            if events is None:
+                yield _sse("resync", {"reason": "fell behind"}, broker.event_id(new_cursor))
+            else:
+                for event_cursor, event_type, data in events:
+                    yield _sse(event_type, data, broker.event_id(event_cursor))
+            cursor = new_cursor
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # stop nginx from buffering the stream
+    })
 
 
 @uploads_bp.route("/approve/<int:upload_id>", methods=["PATCH"])
+@idempotent
 def approve_upload(upload_id):
     try:
         upload = Upload.query.get(upload_id)
@@ -174,6 +404,28 @@ def approve_upload(upload_id):
             current_app.logger.warning(f"User {upload.user_id} not found for upload {upload.id}")
 
         db.session.commit()
+        invalidate(*UPLOAD_LIST_ENDPOINTS)
+
+        broker.publish("upload.approved", {
+            "id": upload.id,
+            "user_id": upload.user_id,
+            "centre_id": upload.centre_id,
+            "points_awarded": upload.points_awarded,
+            "not_verified": upload.not_verified,
+        }, centre_id=upload.centre_id)
+
+        if user:
+            try:
+                leaderboard.record(
+                    user.id,
+                    upload.points_awarded or 0,
+                    centre_id=upload.centre_id,
+                    user_name=user.user_name,
+                    when=upload.upload_date,
+                )
+            except Exception as e:
+                current_app.logger.warning(f"Leaderboard update failed for upload {upload.id}: {e}")
+            invalidate("leaderboard.get_leaderboard")
 
         return jsonify({
             "message": f"Upload #{upload.id} verified successfully.",
@@ -0,0 +1,337 @@
+# backend/app/storage.py
+"""
+Content-addressed storage for upload images.
+
+Images are stored under the SHA-256 of their bytes (`<sha256>.<ext>` is
+what ends up in `Upload.filename_url`). Stored objects never change, so they
+can be served with a strong ETag and a long `immutable` Cache-Control.
+
+Backends:
+  * LocalStorage: sharded directory tree, `<root>/ab/cd/<sha256>.<ext>`.
+    Suitable for a single node, or several nodes sharing a volume.
+  * S3Storage: any S3-compatible endpoint (AWS, MinIO, ...). boto3 is only
+    imported when this backend is configured, and a client can be passed in
+    directly so a local stand-in can replace the real service.
+
+With the S3 backend every node keeps a bounded read-through cache on local
+disk (UPLOAD_CACHE_DIR, UPLOAD_CACHE_MAX_BYTES), so repeated views are served
+from disk instead of going back to object storage each time. Recency is kept in
+the files' atime, so all workers on a node share one LRU. A worker sizes the
+cache with one directory scan on its first write (not at startup), then counts
+only the bytes it adds itself. When that count passes the limit, the worker
+rescans the directory and evicts the least recently read files.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+import time
+
+from flask import send_file
+
+logger = logging.getLogger(__name__)
+
+KEY_PATTERN = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+TMP_DIRNAME = ".tmp"
+CHUNK_SIZE = 1024 * 1024
+
+
+def is_valid_key(key):
+    return bool(key) and KEY_PATTERN.match(key) is not None
+
+
+def shard_path(key):
+    """`<sha256>.<ext>` -> `ab/cd/<sha256>.<ext>` (keeps directories small)."""
+    return f"{key[0:2]}/{key[2:4]}/{key}"
+
+
+class StagedFile:
+    """An upload spooled to local disk, hashed, but not yet committed to storage."""
+    __slots__ = ("key", "path")
+
+    def __init__(self, key, path):
+        self.key = key
+        self.path = path
+
+
+class LocalStorage:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, TMP_DIRNAME), exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, *shard_path(key).split("/"))
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def put_file(self, src_path, key):
+        """Move `src_path` into place (atomic; a no-op when the content is already stored)."""
+        dest = self.path(key)
+        if os.path.exists(dest):
+            os.remove(src_path)
+            return dest
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(src_path, dest)
+        return dest
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Storage:
+    def __init__(self, bucket, prefix="", client=None, endpoint_url=None, region=None,
+                 access_key=None, secret_key=None):
+        if client is None:
+            import boto3
+
+            client = boto3.client(
+                "s3",
+                endpoint_url=endpoint_url or None,
+                region_name=region or None,
+                aws_access_key_id=access_key or None,
+                aws_secret_access_key=secret_key or None,
+            )
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def object_key(self, key):
+        return self.prefix + shard_path(key)
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put_file(self, src_path, key):
+        if self.exists(key):
+            return
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        self.client.upload_file(
+            src_path, self.bucket, self.object_key(key),
+            ExtraArgs={"ContentType": content_type, "CacheControl": "public, max-age=31536000, immutable"},
+        )
+
+    def download(self, key, dest_path):
+        """Fetch an object into `dest_path`; raises FileNotFoundError if it does not exist."""
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.download_file(self.bucket, self.object_key(key), dest_path)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(key) from None
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+
+class ReadThroughCache:
+    """Bounded local LRU of remote objects, laid out like LocalStorage."""
+
+    def __init__(self, remote, cache_dir, max_bytes):
+        self.remote = remote
+        self.disk = LocalStorage(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._fills = {}  # key -> Lock, so concurrent misses download once per worker
+        self._bytes = None  # unknown until the first write; see _account
+
+    def _scan(self):
+        for dirpath, dirnames, filenames in os.walk(self.disk.root):
+            dirnames[:] = [d for d in dirnames if d != TMP_DIRNAME]
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue  # evicted by another worker meanwhile
+                yield path, st
+
+    def _scan_total(self):
+        return sum(st.st_size for _, st in self._scan())
+
+    def _touch(self, path):
+        # Only atime moves, so Last-Modified (mtime) stays stable for conditional GETs
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except FileNotFoundError:
+            pass
+
+    def _account(self, size):
+        if self._bytes is None:
+            total = self._scan_total()  # already includes `size`
+            with self._lock:
+                if self._bytes is None:
+                    self._bytes, size = total, 0
+        with self._lock:
+            self._bytes += size
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently read files until the cache is at 90% of its budget."""
+        entries = sorted(self._scan(), key=lambda entry: entry[1].st_atime)
+        total = sum(st.st_size for _, st in entries)
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for path, st in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            total -= st.st_size
+        if evicted:
+            logger.info(f"Upload cache evicted {evicted} files, {total / 1024 / 1024:.1f} MiB remain")
+        with self._lock:
+            self._bytes = total
+
+    def put_file(self, src_path, key):
+        """Write through: upload, then keep the local copy as a cache entry."""
+        self.remote.put_file(src_path, key)
+        size = os.path.getsize(src_path)
+        self.disk.put_file(src_path, key)
+        self._account(size)
+
+    def local_path(self, key):
+        path = self.disk.path(key)
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+
+        with self._lock:
+            fill_lock = self._fills.setdefault(key, threading.Lock())
+        with fill_lock:
+            try:
+                if os.path.exists(path):
+                    return path
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.disk.root, TMP_DIRNAME))
+                os.close(fd)
+                try:
+                    self.remote.download(key, tmp_path)
+                    size = os.path.getsize(tmp_path)
+                    self.disk.put_file(tmp_path, key)
+                except Exception:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+            finally:
+                with self._lock:
+                    self._fills.pop(key, None)
+        self._account(size)
+        return path
+
+    def delete(self, key):
+        self.remote.delete(key)
+        self.disk.delete(key)
+
+
+class UploadStorage:
+    def __init__(self):
+        self.backend = None
+        self.max_age = 365 * 24 * 3600
+
+    def init_app(self, app, s3_client=None):
+        """`s3_client` replaces the boto3 client built from the S3_* settings (e.g. a local stand-in)."""
+        config = app.config
+        self.max_age = config.get("UPLOAD_MAX_AGE", self.max_age)
+        if config.get("UPLOAD_STORAGE", "local") == "s3":
+            if not config.get("S3_BUCKET"):
+                raise RuntimeError("UPLOAD_STORAGE=s3 requires S3_BUCKET")
+            remote = S3Storage(
+                config["S3_BUCKET"],
+                prefix=config.get("S3_PREFIX", ""),
+                client=s3_client,
+                endpoint_url=config.get("S3_ENDPOINT_URL"),
+                region=config.get("S3_REGION"),
+                access_key=config.get("S3_ACCESS_KEY_ID"),
+                secret_key=config.get("S3_SECRET_ACCESS_KEY"),
+            )
+            self.backend = ReadThroughCache(remote, config["UPLOAD_CACHE_DIR"], config["UPLOAD_CACHE_MAX_BYTES"])
+        else:
+            self.backend = LocalStorage(config["UPLOAD_STORAGE_DIR"])
+
+    @property
+    def _tmp_dir(self):
+        disk = self.backend.disk if isinstance(self.backend, ReadThroughCache) else self.backend
+        return os.path.join(disk.root, TMP_DIRNAME)
+
+    def stage(self, file_storage, ext):
+        """Spool an uploaded file to local disk while hashing it."""
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = file_storage.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        return StagedFile(f"{digest.hexdigest()}.{ext.lower()}", tmp_path)
+
+    def commit(self, staged):
+        """Store a staged file under its content key."""
+        self.backend.put_file(staged.path, staged.key)
+
+    def discard(self, staged):
+        if staged is not None and os.path.exists(staged.path):
+            os.remove(staged.path)
+
+    def local_path(self, key):
+        """Path of a stored object on local disk; raises FileNotFoundError if it is not stored."""
+        if isinstance(self.backend, ReadThroughCache):
+            return self.backend.local_path(key)
+        path = self.backend.path(key)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(key)
+        return path
+
+    def send(self, key):
+        """
+        Response for a stored image. Werkzeug handles Range / If-Range (206),
+        If-None-Match and If-Modified-Since (304) when `conditional` is set.
+        """
+        def build(path):
+            return send_file(
+                path,
+                mimetype=mimetypes.guess_type(key)[0],
+                conditional=True,
+                etag=key.split(".", 1)[0],
+                max_age=self.max_age,
+            )
+
+        try:
+            response = build(self.local_path(key))
+        except FileNotFoundError:
+            if not isinstance(self.backend, ReadThroughCache):
+                raise
+            # Evicted by another worker between lookup and open: fetch it once more
+            response = build(self.local_path(key))
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+storage = UploadStorage()
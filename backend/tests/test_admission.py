@@ -0,0 +1,136 @@
+import time
+
+import pytest
+from flask import Blueprint, session
+
+from app.admission import AdmissionControl, MemoryStore, SQLiteStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return MemoryStore() if request.param == "memory" else SQLiteStore(str(tmp_path / "limits.db"))
+
+
+def test_bucket_allows_burst_then_refills(store):
+    assert [store.take("k", 3, 1.0, 100.0) for _ in range(3)] == [0, 0, 0]
+    assert store.take("k", 3, 1.0, 100.0) == pytest.approx(1.0)
+    assert store.take("k", 3, 1.0, 101.0) == 0
+
+
+def test_slots_are_bounded_and_released(store):
+    first = store.acquire_slot(2, 100.0, 60)
+    second = store.acquire_slot(2, 100.0, 60)
+    assert first and second and store.acquire_slot(2, 100.0, 60) is None
+    assert store.slots_in_use(100.0, 60) == 2
+    store.release_slot(first)
+    assert store.acquire_slot(2, 100.0, 60) is not None
+
+
+def test_stale_slots_are_reclaimed(store):
+    assert store.acquire_slot(1, 100.0, 60)
+    assert store.acquire_slot(1, 130.0, 60) is None
+    assert store.acquire_slot(1, 161.0, 60) is not None
+
+
+def test_sqlite_slots_are_shared_between_store_instances(tmp_path):
+    path = str(tmp_path / "limits.db")
+    assert SQLiteStore(path).acquire_slot(1, 100.0, 60)
+    assert SQLiteStore(path).acquire_slot(1, 100.0, 60) is None
+
+
+def test_sqlite_store_does_not_fsync_every_commit(tmp_path):
+    conn = SQLiteStore(str(tmp_path / "limits.db"))._conn()
+    assert conn.execute("PRAGMA synchronous").fetchone() == (1,)  # NORMAL
+
+
+def test_buckets_default_to_memory_with_host_wide_slots(app, tmp_path):
+    app.config.update(RATE_LIMIT_SQLITE_PATH=str(tmp_path / "limits.db"))
+    first, second = AdmissionControl(), AdmissionControl()
+    first.init_app(app)
+    second.init_app(app)
+    assert isinstance(first.store, MemoryStore) and first.store is not second.store
+    assert first.slots.acquire_slot(1, time.time(), 60)
+    assert second.inference_depth() == 1
+
+    app.config.update(RATE_LIMIT_STORAGE="sqlite")
+    shared = AdmissionControl()
+    shared.init_app(app)
+    assert isinstance(shared.store, SQLiteStore) and shared.slots is shared.store
+
+
+@pytest.fixture
+def client(app, tmp_path):
+    app.config.update(
+        RATE_LIMIT_SQLITE_PATH=str(tmp_path / "limits.db"),
+        RATE_LIMITS={"inference": (100, 1.0), "default": (2, 0.001)},
+        INFERENCE_MAX_INFLIGHT=1,
+    )
+    control = AdmissionControl()
+    control.init_app(app)
+    app.extensions["admission_test"] = control
+
+    @app.route("/ping")
+    def ping():
+        return "ok"
+
+    @app.route("/login/<int:user_id>")
+    def login(user_id):
+        session["user_id"] = user_id
+        return "ok"
+
+    uploads = Blueprint("uploads", __name__)
+
+    @uploads.route("/uploads/", methods=["POST"])
+    def upload_file():
+        return "created", 201
+
+    app.register_blueprint(uploads)
+    return app.test_client()
+
+
+def _get(client, path, ip):
+    return client.get(path, environ_base={"REMOTE_ADDR": ip})
+
+
+def test_anonymous_requests_are_limited_per_ip(client):
+    assert _get(client, "/ping", "10.0.0.1").status_code == 200
+    assert _get(client, "/ping", "10.0.0.1").status_code == 200
+    response = _get(client, "/ping", "10.0.0.1")
+    assert response.status_code == 429 and int(response.headers["Retry-After"]) >= 1
+    assert _get(client, "/ping", "10.0.0.2").status_code == 200
+
+
+def test_logged_in_users_behind_one_ip_do_not_share_a_bucket(client, app):
+    heavy, light = client, app.test_client()
+    _get(heavy, "/login/1", "10.0.0.9")
+    _get(light, "/login/2", "10.0.0.9")  # the shared IP bucket is now empty
+    assert _get(heavy, "/ping", "10.0.0.9").status_code == 200
+    assert _get(heavy, "/ping", "10.0.0.9").status_code == 200
+    assert _get(heavy, "/ping", "10.0.0.9").status_code == 429
+    assert _get(light, "/ping", "10.0.0.9").status_code == 200
+
+
+def test_inference_is_shed_when_all_slots_are_taken(client, app):
+    control = app.extensions["admission_test"]
+    held = control.slots.acquire_slot(1, time.time(), 60)
+    response = client.post("/uploads/", environ_base={"REMOTE_ADDR": "10.0.0.3"})
+    assert response.status_code == 503 and "Retry-After" in response.headers
+    control.slots.release_slot(held)
+    assert client.post("/uploads/", environ_base={"REMOTE_ADDR": "10.0.0.3"}).status_code == 201
+    assert control.inference_depth() == 0  # released at teardown
+
+
+def test_proxy_fix_uses_forwarded_client_address(app):
+    from werkzeug.middleware.proxy_fix import ProxyFix
+
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+
+    @app.route("/ip")
+    def ip():
+        from flask import request
+        return request.remote_addr
+
+    response = app.test_client().get(
+        "/ip", headers={"X-Forwarded-For": "203.0.113.7"}, environ_base={"REMOTE_ADDR": "10.0.0.1"}
+    )
+    assert response.text == "203.0.113.7"
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from app.archive import _schema, archived_points, iter_archived  # noqa: E402
+
+
+def _row(id, user_id, centre_id, upload_date, points=10):
+    return {
+        "id": id, "user_id": user_id, "user_name": f"user{user_id}", "filename_url": f"{id}.jpg",
+        "category": "plastic", "confidence": 0.9, "points_awarded": points, "weight": 1.0,
+        "centre_id": centre_id, "not_verified": False, "upload_date": upload_date,
+    }
+
+
+@pytest.fixture
+def archive(app, tmp_path):
+    root = tmp_path / "archive"
+    directory = root / "year=2024" / "month=01"
+    directory.mkdir(parents=True)
+    rows = [
+        _row(1, 1, 1, datetime(2024, 1, 1, 9)),
+        _row(2, 2, 1, datetime(2024, 1, 31, 18)),
+        _row(3, 1, 2, datetime(2024, 1, 15, 12)),
+    ]
+    pq.write_table(pa.Table.from_pylist(rows, schema=_schema()), directory / "part-1.parquet")
+    app.config["UPLOAD_ARCHIVE_DIR"] = str(root)
+    with app.app_context():
+        yield
+
+
+def test_exclusive_upper_bound_keeps_last_day(archive):
+    ids = [r["id"] for r in iter_archived(date_before=datetime(2024, 2, 1))]
+    assert sorted(ids) == [1, 2, 3]
+    ids = [r["id"] for r in iter_archived(date_before=datetime(2024, 1, 31))]
+    assert sorted(ids) == [1, 3]
+
+
+def test_filters_by_centres_and_user(archive):
+    assert sorted(r["id"] for r in iter_archived(centre_ids=[1])) == [1, 2]
+    assert sorted(r["id"] for r in iter_archived(user_id=1)) == [1, 3]
+    assert list(iter_archived(centre_ids=[])) == []
+
+
+def test_archived_points_grouped(archive):
+    assert sorted(archived_points()) == [(1, 1, 10), (1, 2, 10), (2, 1, 10)]
+
+
+def test_no_archive_yields_nothing(app, tmp_path):
+    app.config["UPLOAD_ARCHIVE_DIR"] = str(tmp_path / "missing")
+    with app.app_context():
+        assert list(iter_archived()) == []
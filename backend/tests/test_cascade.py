@@ -0,0 +1,87 @@
+import importlib
+import sys
+
+import pytest
+
+from ai.cascade import Cascade
+
+
+class _FakeClassifier:
+    """Answers from a {path: (category, confidence)} table and records each batch."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.batches = []
+
+    def predict_batch(self, paths):
+        self.batches.append(list(paths))
+        return [{"category": self.answers[p][0], "confidence": self.answers[p][1]} for p in paths]
+
+    def predict(self, path):
+        return self.predict_batch([path])[0]
+
+
+@pytest.fixture
+def models():
+    fast = _FakeClassifier({"a": ("can", 0.9), "b": ("bottle", 0.3), "c": ("paper", 0.6), "d": ("glass", 0.59)})
+    full = _FakeClassifier({p: (f"full-{p}", 0.99) for p in "abcd"})
+    return fast, full
+
+
+def test_only_unsure_items_are_escalated_in_order(models):
+    fast, full = models
+    results = Cascade(fast, full, 0.6).predict_batch(["a", "b", "c", "d"])
+    assert fast.batches == [["a", "b", "c", "d"]]
+    assert full.batches == [["b", "d"]]  # one batch, original order
+    assert results == [
+        {"category": "can", "confidence": 0.9, "stage": "fast"},
+        {"category": "full-b", "confidence": 0.99, "stage": "full"},
+        {"category": "paper", "confidence": 0.6, "stage": "fast"},  # at the threshold: kept
+        {"category": "full-d", "confidence": 0.99, "stage": "full"},
+    ]
+
+
+def test_confident_batch_never_touches_the_full_model(models):
+    fast, full = models
+    results = Cascade(fast, full, 0.5).predict_batch(["a", "c"])
+    assert full.batches == []
+    assert [r["stage"] for r in results] == ["fast", "fast"]
+
+
+@pytest.mark.parametrize("threshold, escalated", [(0.0, []), (0.95, ["a", "b", "c", "d"])])
+def test_threshold_bounds(models, threshold, escalated):
+    fast, full = models
+    Cascade(fast, full, threshold).predict_batch(["a", "b", "c", "d"])
+    assert full.batches == ([escalated] if escalated else [])
+
+
+def test_predict_returns_a_single_staged_result(models):
+    fast, full = models
+    assert Cascade(fast, full, 0.6).predict("b") == {"category": "full-b", "confidence": 0.99, "stage": "full"}
+
+
+@pytest.fixture
+def create_model(monkeypatch):
+    """ai.create_model imported in-process mode with the cascade configured."""
+    monkeypatch.delenv("INFERENCE_SOCKET_PATH", raising=False)
+    monkeypatch.setenv("CASCADE_FAST_MODEL_NAME", "fast-model")
+    monkeypatch.setenv("CASCADE_THRESHOLD", "0.7")
+    import ai.config
+
+    importlib.reload(ai.config)
+    monkeypatch.delitem(sys.modules, "ai.create_model", raising=False)
+    module = importlib.import_module("ai.create_model")
+    yield module
+    sys.modules.pop("ai.create_model", None)
+    monkeypatch.undo()
+    importlib.reload(ai.config)
+
+
+def test_importing_create_model_loads_nothing(create_model, monkeypatch):
+    assert create_model.classifier is None
+    loaded = []
+    monkeypatch.setattr(create_model, "load_classifier", lambda name, path: loaded.append(name) or _FakeClassifier({}))
+    classifier = create_model.get_classifier()
+    assert loaded == [create_model.model_name, "fast-model"]
+    assert isinstance(classifier, Cascade) and classifier.threshold == 0.7
+    assert create_model.get_classifier() is classifier and len(loaded) == 2
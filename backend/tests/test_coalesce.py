@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pytest
+from flask import session
+
+from app import coalesce as coalesce_module
+from app.coalesce import coalesce, invalidate
+
+
+@pytest.fixture(autouse=True)
+def fresh_flights(monkeypatch):
+    monkeypatch.setattr(coalesce_module, "_flights", {})
+
+
+@pytest.fixture
+def views(app):
+    """A coalesced view whose behaviour each test scripts through `state`."""
+    state = {"calls": 0, "release": threading.Event(), "entered": threading.Event(), "script": []}
+    state["release"].set()
+
+    def run():
+        state["calls"] += 1
+        state["entered"].set()
+        state["release"].wait(5)
+        step = state["script"].pop(0) if state["script"] else "ok"
+        if step == "raise":
+            raise RuntimeError("boom")
+        if step == "503":
+            return {"error": "busy"}, 503
+        return {"call": state["calls"]}
+
+    @app.route("/public")
+    @coalesce(scope="public")
+    def public():
+        return run()
+
+    @app.route("/mine")
+    @coalesce(scope="user")
+    def mine():
+        return run()
+
+    @app.route("/by-role")
+    @coalesce(scope="role")
+    def by_role():
+        return run()
+
+    @app.route("/login/<int:user_id>/<role>")
+    def login(user_id, role):
+        session.update(user_id=user_id, role=role)
+        return "ok"
+
+    app.config.update(PROPAGATE_EXCEPTIONS=False)
+    return state
+
+
+def _run(app, views, path, followers=3):
+    """One leader request, then `followers` identical ones while it is still running."""
+    results = []
+
+    def get():
+        response = app.test_client().get(path)
+        results.append((response.status_code, response.get_data()))
+
+    views["release"].clear()
+    views["entered"].clear()
+    leader = threading.Thread(target=get)
+    others = [threading.Thread(target=get) for _ in range(followers)]
+    leader.start()
+    assert views["entered"].wait(5)
+    for thread in others:
+        thread.start()
+    time.sleep(0.2)  # let the followers join the flight
+    views["release"].set()
+    for thread in [leader, *others]:
+        thread.join(5)
+    return results
+
+
+def test_followers_replay_the_leaders_body(app, views):
+    results = _run(app, views, "/public")
+    assert views["calls"] == 1
+    assert len(results) == 4 and len(set(results)) == 1 and results[0][0] == 200
+
+
+def test_followers_recompute_when_the_leader_raises(app, views):
+    views["script"] = ["raise"]
+    results = _run(app, views, "/public")
+    assert views["calls"] == 4
+    assert sorted(status for status, _ in results) == [200, 200, 200, 500]
+
+
+def test_server_errors_are_not_shared(app, views):
+    app.config.update(COALESCE_TTL_SECONDS=60)
+    views["script"] = ["503"]
+    results = _run(app, views, "/public")
+    assert views["calls"] == 4
+    assert sorted(status for status, _ in results) == [200, 200, 200, 503]
+    client = app.test_client()
+    assert client.get("/public").status_code == 200  # the 503 was not kept for the TTL
+    assert client.get("/public").json == {"call": 5}  # but this 200 is
+    assert views["calls"] == 5
+
+
+def test_results_are_not_shared_across_users_or_roles(app, views):
+    app.config.update(COALESCE_TTL_SECONDS=60)
+    alice, bob, carol = app.test_client(), app.test_client(), app.test_client()
+    alice.get("/login/1/civilian")
+    bob.get("/login/2/civilian")
+    carol.get("/login/3/corporative")
+
+    assert alice.get("/mine").json == {"call": 1}
+    assert bob.get("/mine").json == {"call": 2}
+    assert alice.get("/mine").json == {"call": 1}
+
+    assert alice.get("/by-role").json == {"call": 3}
+    assert bob.get("/by-role").json == {"call": 3}  # same role
+    assert carol.get("/by-role").json == {"call": 4}
+
+
+def test_nothing_is_replayed_after_the_flight_by_default(app, views):
+    client = app.test_client()
+    assert client.get("/public").json == {"call": 1}
+    assert client.get("/public").json == {"call": 2}
+
+
+def test_invalidate_drops_cached_results(app, views):
+    app.config.update(COALESCE_TTL_SECONDS=60)
+    client = app.test_client()
+    client.get("/public")
+    client.get("/mine")
+    invalidate("public")
+    assert client.get("/public").json == {"call": 3}
+    assert client.get("/mine").json == {"call": 2}  # other endpoints keep theirs
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from app.events import EventBroker
+
+
+@pytest.fixture
+def make_broker(app, tmp_path):
+    def make(history=1000, **config):
+        app.config.update(EVENTS_LOG_PATH=str(tmp_path / "events.log"), EVENTS_POLL_SECONDS=0.05, **config)
+        broker = EventBroker(history=history)
+        broker.init_app(app)
+        return broker
+    return make
+
+
+def test_in_memory_publish_and_since():
+    broker = EventBroker()
+    cursor = broker.cursor()
+    broker.publish("upload.created", {"id": 1}, centre_id=1)
+    broker.publish("upload.created", {"id": 2}, centre_id=2)
+    events, cursor = broker.since(cursor)
+    assert [data["id"] for _, _, data in events] == [1, 2]
+    assert broker.since(cursor) == ([], cursor)
+
+
+def test_event_published_by_another_worker_is_delivered(make_broker):
+    subscriber, publisher = make_broker(), make_broker()
+    cursor = subscriber.cursor()
+    received = []
+
+    def listen():
+        if subscriber.wait(cursor, 5):
+            received.extend(subscriber.since(cursor, centre_id=7)[0])
+
+    thread = threading.Thread(target=listen)
+    thread.start()
+    publisher.publish("upload.created", {"id": 1}, centre_id=7)
+    thread.join(5)
+    assert [(t, d) for _, t, d in received] == [("upload.created", {"id": 1})]
+
+
+def test_event_ids_resume_across_workers(make_broker):
+    a, b = make_broker(), make_broker()
+    start, _ = a.cursor(), b.cursor()
+    a.publish("upload.created", {"id": 1})
+    events, _ = a.since(start)
+    first_id = a.event_id(events[0][0])
+    a.publish("upload.approved", {"id": 1})
+
+    resumed = b.parse_event_id(first_id)
+    assert resumed is not None
+    events, _ = b.since(resumed)
+    assert [t for _, t, _ in events] == ["upload.approved"]
+
+
+def test_cursor_older_than_buffer_is_replayed_from_log(make_broker):
+    broker = make_broker(history=2)
+    cursor = broker.cursor()
+    for i in range(5):
+        broker.publish("upload.created", {"id": i})
+    events, _ = broker.since(cursor)
+    assert [d["id"] for _, _, d in events] == [0, 1, 2, 3, 4]
+
+
+def test_rotation_forces_resync(make_broker):
+    broker = make_broker(EVENTS_LOG_MAX_BYTES=200)
+    broker.publish("upload.created", {"id": 0})
+    cursor = broker.cursor()
+    for i in range(1, 10):
+        broker.publish("upload.created", {"id": i, "pad": "x" * 50})
+    broker._poll()
+    assert broker.parse_event_id(broker.event_id(cursor)) is None
+    events, new_cursor = broker.since(cursor)
+    assert events is None and new_cursor[0] != cursor[0]
+
+
+def test_forged_event_id_is_rejected(make_broker):
+    broker = make_broker()
+    broker.cursor()
+    assert broker.parse_event_id("nope") is None
+    assert broker.parse_event_id(f"{broker.epoch}-999999") is None
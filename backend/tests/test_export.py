@@ -0,0 +1,54 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from app.export import EXPORT_FIELDS, export_lines, gzip_chunks, parse_date_arg
+
+ROWS = [
+    {field: None for field in EXPORT_FIELDS} | {"id": 1, "user_name": "Wanjiru", "category": "plastic"},
+    {field: None for field in EXPORT_FIELDS} | {"id": 2, "user_name": "Otieno, J.", "category": "glass"},
+]
+
+
+def test_csv_lines_have_header_and_quote_fields():
+    body = b"".join(export_lines(iter(ROWS), "csv")).decode()
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert [r["id"] for r in rows] == ["1", "2"]
+    assert rows[1]["user_name"] == "Otieno, J."
+
+
+def test_csv_header_only_when_empty():
+    body = b"".join(export_lines(iter([]), "csv")).decode()
+    assert body.strip() == ",".join(EXPORT_FIELDS)
+
+
+def test_ndjson_one_object_per_line():
+    chunks = list(export_lines(iter(ROWS), "ndjson"))
+    assert len(chunks) == 2
+    assert json.loads(chunks[1])["user_name"] == "Otieno, J."
+
+
+def test_gzip_chunks_round_trip():
+    data = [b"x" * 1000 for _ in range(200)]
+    out = list(gzip_chunks(iter(data), flush_every=10_000))
+    assert len(out) > 1  # flushed incrementally, not in one final block
+    assert gzip.decompress(b"".join(out)) == b"".join(data)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("2024-01-31", datetime(2024, 2, 1)),
+    ("2024-01-31T12:30:00", datetime(2024, 1, 31, 12, 30, 0, 1)),
+])
+def test_date_only_upper_bound_covers_whole_day(app, raw, expected):
+    with app.test_request_context(f"/?to={raw}"):
+        assert parse_date_arg("to", end=True) == (expected, None)
+
+
+def test_invalid_date_reports_error(app):
+    with app.test_request_context("/?from=31/01/2024"):
+        value, error = parse_date_arg("from")
+    assert value is None and "from" in error
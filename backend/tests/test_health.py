@@ -0,0 +1,75 @@
+import sys
+import types
+
+import pytest
+
+from app import health
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Stand-ins for ai.create_model / app.image_index whose warmup fails until told otherwise."""
+    state = {"fail": True, "warm": False, "calls": 0}
+
+    def warmup():
+        state["calls"] += 1
+        if state["fail"]:
+            raise RuntimeError("model file missing")
+        state["warm"] = True
+
+    model = types.ModuleType("ai.create_model")
+    model.warmup = warmup
+    model.is_warm = lambda: state["warm"]
+    index = types.ModuleType("app.image_index")
+    index.image_index = types.SimpleNamespace(warm=lambda: None)
+    monkeypatch.setitem(sys.modules, "ai.create_model", model)
+    monkeypatch.setitem(sys.modules, "app.image_index", index)
+    monkeypatch.setattr(health, "_warmup", {"thread": None, "error": None, "failed_at": 0.0, "failures": 0})
+    return state
+
+
+def _probe(app):
+    with app.app_context():
+        result = health._check_model()
+        thread = health._warmup["thread"]
+        if thread is not None:
+            thread.join(5)
+        return result
+
+
+def test_retry_delay_doubles_up_to_cap():
+    config = {"HEALTH_WARMUP_RETRY_SECONDS": 10, "HEALTH_WARMUP_RETRY_MAX_SECONDS": 60}
+    assert [health._retry_delay(config, n) for n in (1, 2, 3, 4, 5)] == [10, 20, 40, 60, 60]
+
+
+def test_failed_warmup_is_retried_after_backoff(app, fake_model, monkeypatch):
+    app.config.update(HEALTH_WARMUP_RETRY_SECONDS=10, HEALTH_WARMUP_RETRY_MAX_SECONDS=60)
+    clock = [1000.0]
+    monkeypatch.setattr(health.time, "monotonic", lambda: clock[0])
+
+    assert _probe(app) == (False, "warming up")
+    assert fake_model["calls"] == 1 and health._warmup["failures"] == 1
+
+    ok, detail = _probe(app)
+    assert not ok and "retrying in 10s" in detail
+    assert fake_model["calls"] == 1  # still backing off
+
+    clock[0] += 10
+    fake_model["fail"] = False
+    assert _probe(app) == (False, "warming up")
+    assert fake_model["calls"] == 2
+    assert health._warmup["error"] is None and health._warmup["failures"] == 0
+    assert _probe(app) == (True, "ok")
+
+
+def test_backoff_grows_with_consecutive_failures(app, fake_model, monkeypatch):
+    app.config.update(HEALTH_WARMUP_RETRY_SECONDS=10, HEALTH_WARMUP_RETRY_MAX_SECONDS=60)
+    clock = [1000.0]
+    monkeypatch.setattr(health.time, "monotonic", lambda: clock[0])
+
+    _probe(app)
+    clock[0] += 10
+    _probe(app)  # second attempt fails too
+    assert health._warmup["failures"] == 2
+    ok, detail = _probe(app)
+    assert not ok and "retrying in 20s" in detail
@@ -0,0 +1,111 @@
+import io
+import time
+
+import pytest
+from flask import Blueprint, request
+
+from app import idempotency
+from app.admission import AdmissionControl
+from app.idempotency import IN_PROGRESS, MISMATCH, NEW, REPLAY, MemoryStore, SQLiteStore, _decide, idempotent
+
+TTL, PENDING = 3600, 60
+
+
+@pytest.mark.parametrize("record, fingerprint, now, expected", [
+    (None, "a", 100.0, None),
+    (("done", "a", 100.0), "a", 200.0, REPLAY),
+    (("done", "a", 100.0), "b", 200.0, MISMATCH),
+    (("done", "a", 100.0), "a", 100.0 + TTL, None),
+    (("pending", "a", 100.0), "a", 130.0, IN_PROGRESS),
+    (("pending", "a", 100.0), "b", 130.0, MISMATCH),
+    (("pending", "a", 100.0), "a", 100.0 + PENDING, None),  # original worker died
+])
+def test_decide(record, fingerprint, now, expected):
+    assert _decide(record, fingerprint, now, TTL, PENDING) == expected
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return MemoryStore() if request.param == "memory" else SQLiteStore(str(tmp_path / "idempotency.db"))
+
+
+def test_store_records_and_replays(store):
+    assert store.begin("k", "fp", 100.0, TTL, PENDING) == (NEW, None)
+    assert store.has_record("k", 101.0, TTL, PENDING)
+    assert store.begin("k", "fp", 101.0, TTL, PENDING) == (IN_PROGRESS, None)
+    store.complete("k", (201, [["Content-Type", "application/json"]], b"{}"), 102.0)
+    decision, (status, headers, body) = store.begin("k", "fp", 103.0, TTL, PENDING)
+    assert (decision, status, body) == (REPLAY, 201, b"{}")
+    assert store.begin("k", "other", 103.0, TTL, PENDING) == (MISMATCH, None)
+    assert not store.has_record("k", 102.0 + TTL, TTL, PENDING)
+
+
+def test_aborted_key_can_be_reused(store):
+    store.begin("k", "fp", 100.0, TTL, PENDING)
+    store.abort("k")
+    assert not store.has_record("k", 100.0, TTL, PENDING)
+    assert store.begin("k", "other", 100.0, TTL, PENDING) == (NEW, None)
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    app.config.update(IDEMPOTENCY_STORAGE="memory")
+    monkeypatch.setattr(idempotency, "_store", {"instance": None})
+    calls = []
+    uploads = Blueprint("uploads", __name__)
+
+    @uploads.route("/uploads/", methods=["POST"])
+    @idempotent
+    def upload_file():
+        calls.append(request.files["file"].read())
+        return {"id": len(calls)}, 201
+
+    app.register_blueprint(uploads)
+    app.extensions["calls"] = calls
+    return app.test_client()
+
+
+def _upload(client, content, key="key-1", **kwargs):
+    return client.post(
+        "/uploads/",
+        data={"centre_id": "3", "file": (io.BytesIO(content), "bottle.jpg")},
+        headers={"Idempotency-Key": key},
+        **kwargs,
+    )
+
+
+def test_retry_replays_without_running_the_view(client, app):
+    first = _upload(client, b"image-bytes")
+    retry = _upload(client, b"image-bytes")
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true" and retry.json == first.json
+    assert app.extensions["calls"] == [b"image-bytes"]  # the view still saw the whole file
+
+
+def test_same_key_with_a_different_body_is_rejected(client, app):
+    _upload(client, b"image-bytes")
+    assert _upload(client, b"other-image").status_code == 422
+    assert client.post(
+        "/uploads/",
+        data={"centre_id": "4", "file": (io.BytesIO(b"image-bytes"), "bottle.jpg")},
+        headers={"Idempotency-Key": "key-1"},
+    ).status_code == 422
+    assert len(app.extensions["calls"]) == 1
+
+
+def test_recorded_retry_skips_the_inference_budget(client, app):
+    app.config.update(
+        RATE_LIMIT_STORAGE="memory",
+        INFERENCE_SLOT_STORAGE="memory",
+        RATE_LIMITS={"inference": (1, 0.001), "default": (100, 1.0)},
+        INFERENCE_MAX_INFLIGHT=1,
+    )
+    control = AdmissionControl()
+    control.init_app(app)
+
+    assert _upload(client, b"image-bytes").status_code == 201
+    held = control.slots.acquire_slot(1, time.time(), 60)  # the inference queue is now full
+    retry = _upload(client, b"image-bytes")
+    assert retry.status_code == 201 and retry.headers["Idempotent-Replayed"] == "true"
+    control.slots.release_slot(held)
+    assert _upload(client, b"image-bytes", key="key-2").status_code == 429  # the one token went to the first
@@ -0,0 +1,143 @@
+import random
+import sys
+
+import pytest
+
+from app.image_index import RECORD, HashIndex, chunk_layout, dhash, nearest_duplicate
+
+image_index_module = sys.modules["app.image_index"]  # `app.image_index` is shadowed by the instance
+
+
+def _flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+@pytest.fixture
+def index(app, tmp_path):
+    app.config["PHASH_INDEX_PATH"] = str(tmp_path / "upload_hashes.bin")
+    idx = HashIndex()
+    idx.init_app(app)
+    return idx
+
+
+def test_search_finds_hashes_within_radius(index):
+    rng = random.Random(1)
+    base = rng.getrandbits(64)
+    for upload_id in range(1, 500):
+        index.add(upload_id, upload_id, None, rng.getrandbits(64))
+    index.add(1000, 1, 5, _flip(base, [0, 17, 40]))
+    index.add(1001, 2, 5, _flip(base, [1, 2, 3, 4, 5, 6, 7, 8, 9]))
+
+    matches = index.search(base, max_distance=6)
+    assert [(m["upload_id"], m["distance"]) for m in matches] == [(1000, 3)]
+
+
+def test_other_workers_records_are_replayed(app, index):
+    index.add(1, 1, None, 0xFFFF)
+    other = HashIndex()
+    other.init_app(app)
+    assert len(other) == 0  # nothing read at boot
+    assert other.search(0xFFFF)[0]["upload_id"] == 1
+    index.add(2, 2, None, 0xFFFE)
+    assert {m["upload_id"] for m in other.search(0xFFFF)} == {1, 2}
+
+
+def test_partial_tail_record_is_ignored(app, index, tmp_path):
+    index.add(1, 1, None, 42)
+    with open(app.config["PHASH_INDEX_PATH"], "ab") as fh:
+        fh.write(b"\x01\x02\x03")
+    other = HashIndex()
+    other.init_app(app)
+    assert [m["upload_id"] for m in other.search(42)] == [1]
+
+
+def test_duplicate_of_only_flags_earlier_same_user_or_centre(index):
+    index.add(1, 10, 5, 0xABCDEF)
+    index.add(2, 11, 6, _flip(0xABCDEF, [3]))   # other user, other centre
+    index.add(3, 12, 5, _flip(0xABCDEF, [4]))   # same centre as 1
+    assert index.duplicate_of(1) is None
+    assert index.duplicate_of(2) is None
+    assert index.duplicate_of(3) == {"upload_id": 1, "distance": 1, "same_user": False}
+    assert index.duplicate_of(99) is None
+
+
+def test_nearest_duplicate_prefers_nearest_match():
+    matches = [
+        {"upload_id": 4, "user_id": 2, "centre_id": None, "distance": 0},
+        {"upload_id": 3, "user_id": 1, "centre_id": None, "distance": 2},
+    ]
+    assert nearest_duplicate(matches, 1, None) == {"upload_id": 3, "distance": 2, "same_user": True}
+
+
+def test_dhash_is_stable_under_rescaling(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    image = Image.linear_gradient("L").rotate(30).convert("RGB")
+    image.save(tmp_path / "a.png")
+    image.resize((128, 128)).save(tmp_path / "b.jpg", quality=80)
+    assert (dhash(str(tmp_path / "a.png")) ^ dhash(str(tmp_path / "b.jpg"))).bit_count() <= 6
+
+
+def test_chunk_layout_grows_chunks_with_the_index():
+    for count in (0, 1000, 1_000_000, 4_000_000):
+        layout = chunk_layout(count, 6)
+        assert sum(bits for _, bits in layout) == 64
+        assert [shift for shift, _ in layout] == [sum(b for _, b in layout[:i]) for i in range(len(layout))]
+    assert [bits for _, bits in chunk_layout(1000, 6)] == [16, 16, 16, 16]
+    assert len(chunk_layout(4_000_000, 6)) == 3  # wider chunks keep candidates per probe low
+
+
+@pytest.mark.parametrize("delta_max", [4, 10_000])
+def test_search_matches_brute_force_across_segment_and_tail(app, index, monkeypatch, delta_max):
+    monkeypatch.setattr(image_index_module, "DELTA_MAX_RECORDS", delta_max)
+    rng = random.Random(7)
+    entries = {}
+    bases = [rng.getrandbits(64) for _ in range(20)]
+    for upload_id in range(1, 301):
+        base = bases[upload_id % len(bases)]
+        value = _flip(base, rng.sample(range(64), rng.randrange(0, 9)))
+        entries[upload_id] = value
+        index.add(upload_id, upload_id % 7, upload_id % 3, value)
+    assert len(index) == 300
+    if delta_max == 4:
+        assert index._segment is not None and index._delta_count < 4
+
+    other = HashIndex()
+    other.init_app(app)  # bulk-loads everything into one segment
+    for probe in bases[:5]:
+        expected = sorted(
+            ((value ^ probe).bit_count(), upload_id)
+            for upload_id, value in entries.items() if (value ^ probe).bit_count() <= 6
+        )
+        for idx in (index, other):
+            assert [(m["distance"], m["upload_id"]) for m in idx.search(probe)] == expected
+
+
+def test_duplicate_of_finds_rows_in_the_segment_with_unordered_ids(index, monkeypatch):
+    monkeypatch.setattr(image_index_module, "DELTA_MAX_RECORDS", 2)
+    index.add(5, 10, 1, 0xABCDEF)
+    index.add(3, 11, 1, _flip(0xABCDEF, [1]))   # written by a slower worker
+    index.add(9, 12, 1, _flip(0xABCDEF, [2]))
+    assert index._segment is not None and index._segment.id_order is not None
+    assert index.duplicate_of(5) == {"upload_id": 3, "distance": 1, "same_user": False}
+    assert index.duplicate_of(3) is None
+
+
+def test_unchanged_file_is_not_reopened(index, monkeypatch):
+    index.add(1, 1, None, 42)
+    opened = []
+    real_open = open
+    monkeypatch.setattr(image_index_module, "open", lambda *a, **kw: opened.append(a) or real_open(*a, **kw),
+                        raising=False)
+    index.search(42)
+    index.duplicate_of(1)
+    assert opened == []
+
+
+def test_shrunk_file_is_reloaded(app, index):
+    index.add(1, 1, None, 42)
+    index.add(2, 1, None, 43)
+    with open(app.config["PHASH_INDEX_PATH"], "wb") as fh:
+        fh.write(RECORD.pack(7, 1, 0, 42))
+    assert [m["upload_id"] for m in index.search(42)] == [7]
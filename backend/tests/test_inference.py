@@ -0,0 +1,193 @@
+import importlib
+import io
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+from ai.inference_client import InferenceClient, InferenceTimeout, ServiceUnreachable
+from ai.inference_protocol import (
+    ProtocolError,
+    STATUS_ERROR,
+    recv_request,
+    recv_response,
+    send_request,
+    send_response,
+)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets only")
+
+
+def _png_bytes():
+    Image = pytest.importorskip("PIL.Image")
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_framing_round_trip():
+    a, b = socket.socketpair()
+    with a, b:
+        send_request(a, b"image-bytes")
+        assert recv_request(b) == b"image-bytes"
+        send_response(b, STATUS_ERROR, {"error": "boom"})
+        assert recv_response(a) == (STATUS_ERROR, {"error": "boom"})
+        a.close()
+        assert recv_request(b) is None
+
+
+def test_bad_magic_is_rejected():
+    a, b = socket.socketpair()
+    with a, b:
+        a.sendall(b"NOPE\x00\x00\x00\x01x")
+        with pytest.raises(ProtocolError):
+            recv_request(b)
+
+
+def _listen(path):
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(4)
+    return listener
+
+
+def test_client_reports_unreachable_service(tmp_path):
+    client = InferenceClient(str(tmp_path / "missing.sock"), timeout=0.5)
+    with pytest.raises(ServiceUnreachable):
+        client.predict_bytes(b"x")
+
+
+def test_client_reports_timeout_from_busy_service(tmp_path):
+    path = str(tmp_path / "busy.sock")
+    listener = _listen(path)
+    accepted = []
+    threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True).start()
+    client = InferenceClient(path, timeout=0.2)
+    with pytest.raises(InferenceTimeout):
+        client.predict_bytes(b"x")
+    listener.close()
+
+
+def test_client_against_server_connection_handler(tmp_path):
+    from ai.inference_server import _serve_connection
+
+    class FakeClassifier:
+        def predict(self, image):
+            return {"category": "plastic", "confidence": 0.9, "size": list(image.size)}
+
+    path = str(tmp_path / "ok.sock")
+    listener = _listen(path)
+
+    def serve():
+        conn, _ = listener.accept()
+        _serve_connection(conn, FakeClassifier(), threading.Lock())
+
+    threading.Thread(target=serve, daemon=True).start()
+    client = InferenceClient(path, timeout=2)
+    assert client.predict_bytes(_png_bytes())["size"] == [8, 8]
+    assert client.predict_bytes(_png_bytes())["category"] == "plastic"  # reused connection
+    listener.close()
+
+
+@pytest.fixture
+def create_model(monkeypatch, tmp_path):
+    """ai.create_model imported in client mode (no model is loaded)."""
+    monkeypatch.setenv("INFERENCE_SOCKET_PATH", str(tmp_path / "svc.sock"))
+    monkeypatch.setenv("INFERENCE_FALLBACK", "true")
+    import ai.config
+
+    importlib.reload(ai.config)
+    monkeypatch.delitem(sys.modules, "ai.create_model", raising=False)
+    module = importlib.import_module("ai.create_model")
+    yield module
+    sys.modules.pop("ai.create_model", None)
+    monkeypatch.undo()
+    importlib.reload(ai.config)
+
+
+class _FailingClient:
+    def __init__(self, exc):
+        self.exc = exc
+
+    def predict(self, path):
+        raise self.exc
+
+    predict_bytes = predict
+
+
+class _LocalClassifier:
+    def predict_batch(self, paths):
+        return [{"category": "local", "confidence": 1.0} for _ in paths]
+
+    def predict(self, image):
+        return {"category": "local", "confidence": 1.0}
+
+
+def test_falls_back_only_when_service_unreachable(create_model, monkeypatch):
+    monkeypatch.setattr(create_model, "get_classifier", lambda: _LocalClassifier())
+
+    monkeypatch.setattr(create_model, "client", _FailingClient(ServiceUnreachable("down")))
+    assert create_model.predict("x.jpg")["category"] == "local"
+
+    monkeypatch.setattr(create_model, "client", _FailingClient(InferenceTimeout("busy")))
+    with pytest.raises(InferenceTimeout):
+        create_model.predict("x.jpg")
+
+
+def test_warmup_never_loads_model_in_web_worker(create_model, monkeypatch):
+    pytest.importorskip("PIL")
+    loaded = []
+    monkeypatch.setattr(create_model, "get_classifier", lambda: loaded.append(1) or _LocalClassifier())
+    monkeypatch.setattr(create_model, "client", _FailingClient(ServiceUnreachable("not started")))
+    with pytest.raises(ServiceUnreachable):
+        create_model.warmup()
+    assert not loaded and not create_model.is_warm()
+
+
+SUPERVISOR_SCRIPT = textwrap.dedent("""
+    import os, sys, time, types
+    pid_dir = sys.argv[2]
+
+    def get_classifier():
+        open(os.path.join(pid_dir, str(os.getpid())), "w").close()
+        return object()
+
+    sys.modules["ai.create_model"] = types.SimpleNamespace(get_classifier=get_classifier)
+    import ai.inference_server as server
+    server.RESTART_BACKOFF_SECONDS = 0.1
+    server.serve(sys.argv[1], workers=2)
+""")
+
+
+def _wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_supervisor_restarts_dead_worker(tmp_path):
+    pid_dir = tmp_path / "pids"
+    pid_dir.mkdir()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", SUPERVISOR_SCRIPT, str(tmp_path / "svc.sock"), str(pid_dir)],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        assert _wait_for(lambda: len(os.listdir(pid_dir)) == 2)
+        victim = int(os.listdir(pid_dir)[0])
+        os.kill(victim, 9)
+        assert _wait_for(lambda: len(os.listdir(pid_dir)) == 3)
+    finally:
+        proc.terminate()
+        proc.wait(10)
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+from app.leaderboard import Leaderboard, TopK, period_key
+
+
+def test_topk_keeps_highest_scores_in_order():
+    board = TopK(3)
+    for uid, points in [(1, 10), (2, 30), (3, 20), (4, 5), (5, 25)]:
+        board.add(uid, points)
+    assert board.items() == [(2, 30), (5, 25), (3, 20)]
+
+
+def test_topk_user_can_overtake_into_top():
+    board = TopK(2)
+    for uid, points in [(1, 10), (2, 20), (3, 5)]:
+        board.add(uid, points)
+    board.add(3, 16)  # 21 total
+    assert board.items() == [(3, 21), (2, 20)]
+
+
+def test_topk_ties_break_on_user_id():
+    board = TopK(2)
+    for uid in (9, 4, 7):
+        board.add(uid, 10)
+    assert board.items() == [(4, 10), (7, 10)]
+
+
+def test_period_keys():
+    when = datetime(2024, 1, 31, 12)
+    assert period_key("week", when) == "week:2024-W05"
+    assert period_key("month", when) == "month:2024-01"
+    assert period_key("all", when) == "all"
+
+
+def _fresh_board(**attrs):
+    board = Leaderboard()
+    board._built_at = time.time()
+    for name, value in attrs.items():
+        setattr(board, name, value)
+    return board
+
+
+def test_record_and_top_by_scope():
+    board = _fresh_board()
+    board.record(1, 50, centre_id=7, user_name="Amina")
+    board.record(2, 80, centre_id=8, user_name="Baraka")
+    assert [e["user_id"] for e in board.top()] == [2, 1]
+    assert board.top(scope="centre", centre_id=7) == [{"rank": 1, "user_id": 1, "user_name": "Amina", "points": 50}]
+
+
+def test_stale_read_serves_old_data_and_rebuilds_once():
+    board = _fresh_board(resync_seconds=0)
+    board.record(1, 50)
+    release = threading.Event()
+    calls = []
+
+    def slow_rebuild(now=None):
+        calls.append(now)
+        release.wait(5)
+        board._built_at = time.time()
+
+    board.rebuild = slow_rebuild
+    board._built_at = 1.0  # stale
+    started = time.monotonic()
+    for _ in range(5):
+        assert board.top()[0]["points"] == 50
+    assert time.monotonic() - started < 1
+    release.set()
+    time.sleep(0.05)
+    assert len(calls) == 1
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "leaderboard.json"
+    board = _fresh_board(snapshot_path=str(path))
+    board.record(1, 50, centre_id=7, user_name="Amina")
+    board._write_snapshot()
+    assert json.loads(path.read_text())["names"] == {"1": "Amina"}
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+    restored = Leaderboard()
+    restored.snapshot_path = str(path)
+    restored._load_snapshot()
+    restored._built_at = time.time()
+    assert restored.top(scope="centre", centre_id=7)[0]["points"] == 50
@@ -0,0 +1,111 @@
+import logging
+import signal
+import sys
+import tracemalloc
+import types
+
+import pytest
+
+from app import memprofile
+from app.memprofile import MemoryProfiler, memory_bp
+
+_retained = []
+
+
+@pytest.fixture
+def make_app(app, monkeypatch):
+    """Register a fresh profiler (and the admin blueprint) on the bare app."""
+    def make(**config):
+        app.config.update(config)
+        profiler = MemoryProfiler()
+        monkeypatch.setattr(memprofile, "memory_profiler", profiler)
+        profiler.init_app(app)
+
+        @app.route("/ping")
+        def ping():
+            return "ok"
+
+        @app.route("/grow")
+        def grow():
+            _retained.append([object() for _ in range(20_000)])
+            return "ok"
+
+        app.register_blueprint(memory_bp)
+        return profiler
+
+    yield make
+    _retained.clear()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def test_sampled_requests_record_peaks_per_endpoint(app, make_app):
+    profiler = make_app(MEMPROFILE_ENABLED=True, MEMPROFILE_SAMPLE_RATE=1.0)
+    client = app.test_client()
+    client.get("/ping")
+    client.get("/grow")
+    client.get("/grow")
+    peaks = profiler.endpoint_peaks()
+    assert peaks["ping"]["samples"] == 1 and peaks["grow"]["samples"] == 2
+    assert peaks["grow"]["max_peak_bytes"] > peaks["ping"]["max_peak_bytes"]
+
+
+def test_unsampled_requests_record_nothing(app, make_app):
+    profiler = make_app(MEMPROFILE_ENABLED=True, MEMPROFILE_SAMPLE_RATE=0.0)
+    app.test_client().get("/ping")
+    assert profiler.endpoint_peaks() == {}
+
+
+def test_growth_is_logged_every_n_requests(app, make_app, caplog):
+    make_app(MEMPROFILE_ENABLED=True, MEMPROFILE_SAMPLE_RATE=0.0, MEMPROFILE_SNAPSHOT_EVERY=2)
+    client = app.test_client()
+    with caplog.at_level(logging.WARNING, logger="app.memprofile"):
+        client.get("/grow")
+        assert not caplog.records
+        client.get("/grow")
+    assert any("memprofile growth" in r.getMessage() and "test_memprofile.py" in r.getMessage()
+               for r in caplog.records)
+
+
+def test_disabled_profiler_installs_nothing(app, make_app):
+    make_app(MEMPROFILE_ENABLED=False, MEMPROFILE_ADMIN_TOKEN="secret")
+    assert not tracemalloc.is_tracing()
+    assert app.test_client().get("/admin/memory", headers={"X-Admin-Token": "secret"}).status_code == 404
+
+
+@pytest.mark.parametrize("headers, status", [
+    ({}, 403),
+    ({"X-Admin-Token": "wrong"}, 403),
+    ({"X-Admin-Token": "sécret"}, 403),  # non-ASCII must not turn into a 500
+    ({"X-Admin-Token": "secret"}, 200),
+])
+def test_admin_report_requires_the_token(app, make_app, headers, status):
+    make_app(MEMPROFILE_ENABLED=True, MEMPROFILE_ADMIN_TOKEN="secret")
+    response = app.test_client().get("/admin/memory?limit=5", headers=headers)
+    assert response.status_code == status
+    if status == 200:
+        assert len(response.json["top_sites"]) <= 5 and response.json["rss_bytes"] > 0
+
+
+def test_admin_report_is_hidden_without_a_token(app, make_app):
+    make_app(MEMPROFILE_ENABLED=True)
+    assert app.test_client().get("/admin/memory").status_code == 404
+
+
+def test_worker_recycles_once_over_rss_limit(app, make_app, monkeypatch):
+    kills = []
+    monkeypatch.setitem(sys.modules, "gunicorn", types.ModuleType("gunicorn"))
+    monkeypatch.setattr(memprofile.os, "kill", lambda pid, sig: kills.append(sig))
+    monkeypatch.setattr(memprofile, "current_rss_bytes", lambda: 64 * 1024 * 1024)
+    profiler = make_app(WORKER_MAX_RSS_MB=128, WORKER_RSS_CHECK_EVERY=2)
+    client = app.test_client()
+
+    for _ in range(2):
+        client.get("/ping").close()
+    assert kills == [] and not profiler._recycling
+
+    monkeypatch.setattr(memprofile, "current_rss_bytes", lambda: 256 * 1024 * 1024)
+    for _ in range(4):
+        client.get("/ping").close()
+    assert kills == [signal.SIGTERM]  # once, after the response that crossed the limit
+    assert profiler._recycling
@@ -0,0 +1,114 @@
+import json
+
+import numpy as np
+import pytest
+from PIL import Image
+
+ort = pytest.importorskip("onnxruntime")
+onnx = pytest.importorskip("onnx")
+
+from ai.onnx_backend import OnnxClassifier, metadata_path  # noqa: E402
+from ai.preprocess import DEFAULT_CONFIG  # noqa: E402
+
+LABELS = {"0": "tin can", "1": "water bottle", "2": "paper"}
+SIZE = 32
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    """
+    A tiny graph in the exported layout: pixel_values (batch, 3, s, s) -> logits.
+    Logits are the per-channel means scaled by 2, so a red image is label 0,
+    green label 1 and blue label 2.
+    """
+    from onnx import TensorProto, helper, numpy_helper
+
+    weights = numpy_helper.from_array(np.eye(3, dtype=np.float32) * 2, name="weights")
+    graph = helper.make_graph(
+        [
+            helper.make_node("ReduceMean", ["pixel_values"], ["pooled"], axes=[2, 3], keepdims=0),
+            helper.make_node("MatMul", ["pooled", "weights"], ["logits"]),
+        ],
+        "tiny",
+        [helper.make_tensor_value_info("pixel_values", TensorProto.FLOAT, ["batch", 3, SIZE, SIZE])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["batch", 3])],
+        initializer=[weights],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    path = tmp_path / "tiny.onnx"
+    onnx.save(model, str(path))
+    with open(metadata_path(str(path)), "w") as fh:
+        json.dump({"model_name": "tiny", "id2label": LABELS, "preprocess": {"size": SIZE}}, fh)
+    return str(path)
+
+
+def _solid(tmp_path, name, colour):
+    path = tmp_path / f"{name}.png"
+    Image.new("RGB", (48, 40), colour).save(path)
+    return str(path)
+
+
+def _expected_confidence(colour):
+    normalized = (np.array(colour) / 255.0 - DEFAULT_CONFIG["image_mean"]) / DEFAULT_CONFIG["image_std"]
+    logits = normalized * 2
+    probs = np.exp(logits - logits.max())
+    return float((probs / probs.sum()).max())
+
+
+def test_sidecar_is_found_next_to_the_model():
+    assert metadata_path("/models/resnet-50.onnx") == "/models/resnet-50.json"
+
+
+def test_labels_and_softmax_confidence(model_path, tmp_path):
+    classifier = OnnxClassifier(model_path, num_threads=1)
+    assert classifier.preprocess.size == SIZE
+    colours = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (200, 40, 40)]
+    paths = [_solid(tmp_path, str(i), colour) for i, colour in enumerate(colours)]
+
+    results = classifier.predict_batch(paths)
+    assert [r["category"] for r in results] == ["tin can", "water bottle", "paper", "tin can"]
+    for result, colour in zip(results, colours):
+        assert isinstance(result["confidence"], float)
+        assert result["confidence"] == pytest.approx(_expected_confidence(colour), abs=1e-5)
+    assert classifier.predict(paths[2]) == results[2]
+
+
+def test_batch_size_is_dynamic(model_path, tmp_path):
+    classifier = OnnxClassifier(model_path)
+    path = _solid(tmp_path, "red", (255, 0, 0))
+    assert len(classifier.predict_batch([path] * 5)) == 5
+    assert classifier.predict_logits(np.zeros((2, 3, SIZE, SIZE), dtype=np.float32)).shape == (2, 3)
+
+
+def test_missing_model_points_at_the_export_command(tmp_path):
+    with pytest.raises(FileNotFoundError, match=r"missing\.onnx; run `python -m ai\.export_onnx` first"):
+        OnnxClassifier(str(tmp_path / "missing.onnx"))
+
+
+def test_export_round_trip(tmp_path):
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    from ai.export_onnx import export
+
+    id2label = {int(k): v for k, v in LABELS.items()}
+    config = transformers.ResNetConfig(
+        embedding_size=8, hidden_sizes=[8, 16], depths=[1, 1], layer_type="basic",
+        num_labels=3, id2label=id2label, label2id={v: k for k, v in id2label.items()},
+    )
+    source = tmp_path / "hf"
+    model = transformers.ResNetForImageClassification(config).eval()
+    model.save_pretrained(source)
+    transformers.ConvNextImageProcessor(size={"shortest_edge": SIZE}, crop_pct=0.875, resample=3).save_pretrained(source)
+
+    path = export(str(source), str(tmp_path / "models" / "tiny.onnx"))
+    with open(metadata_path(path)) as fh:
+        meta = json.load(fh)
+    assert meta["id2label"] == LABELS
+    assert meta["preprocess"]["size"] == SIZE and meta["preprocess"]["crop_pct"] == 0.875
+
+    classifier = OnnxClassifier(path)
+    pixels = np.random.default_rng(0).standard_normal((2, 3, SIZE, SIZE)).astype(np.float32)
+    with torch.no_grad():
+        expected = model(pixel_values=torch.from_numpy(pixels)).logits.numpy()
+    np.testing.assert_allclose(classifier.predict_logits(pixels), expected, atol=1e-4)
@@ -0,0 +1,124 @@
+import threading
+import types
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from ai.preprocess import DEFAULT_CONFIG, BatchPreprocessor, config_from_processor, preprocess
+
+MEAN = np.array(DEFAULT_CONFIG["image_mean"])
+STD = np.array(DEFAULT_CONFIG["image_std"])
+
+
+def _image(width, height, seed=0, mode="RGB"):
+    rng = np.random.default_rng(seed)
+    image = Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+    return image.convert(mode)
+
+
+def _reference(image, size=224, crop_pct=0.875):
+    """The same steps written out with PIL and float64 NumPy, one image at a time."""
+    image = image.convert("RGB")
+    width, height = image.size
+    short = int(size / crop_pct)
+    if width <= height:
+        image = image.resize((short, int(short * height / width)), Image.BICUBIC)
+    else:
+        image = image.resize((int(short * width / height), short), Image.BICUBIC)
+    width, height = image.size
+    left, top = (width - size) // 2, (height - size) // 2
+    pixels = np.asarray(image.crop((left, top, left + size, top + size)), dtype=np.float64)
+    return ((pixels / 255.0 - MEAN) / STD).transpose(2, 0, 1)
+
+
+def test_batch_is_contiguous_float32_nchw(tmp_path):
+    path = tmp_path / "photo.png"
+    _image(300, 200, seed=1).save(path)
+    images = [_image(320, 240), _image(200, 300, seed=2, mode="L"), str(path)]
+
+    batch = BatchPreprocessor(**DEFAULT_CONFIG)(images)
+    assert batch.shape == (3, 3, 224, 224)
+    assert batch.dtype == np.float32 and batch.flags["C_CONTIGUOUS"]
+
+
+@pytest.mark.parametrize("width, height", [(320, 240), (200, 300), (224, 224), (1000, 257)])
+def test_matches_the_reference_normalization(width, height):
+    image = _image(width, height, seed=width)
+    actual = BatchPreprocessor(**DEFAULT_CONFIG)([image])[0]
+    assert np.abs(actual - _reference(image)).max() < 1e-6
+
+
+def test_buffer_is_reused_and_grows_on_demand():
+    preprocessor = BatchPreprocessor(**DEFAULT_CONFIG, capacity=2)
+    first = preprocessor([_image(300, 200, seed=1)])
+    kept = first.copy()
+    second = preprocessor([_image(300, 200, seed=2), _image(300, 200, seed=3)])
+    assert np.shares_memory(first, second)
+    assert not np.array_equal(first, kept)  # overwritten by the second call
+
+    larger = preprocessor([_image(300, 200, seed=s) for s in range(3)])
+    assert larger.shape[0] == 3 and not np.shares_memory(larger, second)
+    assert np.shares_memory(preprocessor([_image(300, 200)]), larger)
+
+
+def test_each_thread_gets_its_own_buffer():
+    preprocessor = BatchPreprocessor(**DEFAULT_CONFIG)
+    main = preprocessor([_image(300, 200)])
+    other = []
+    thread = threading.Thread(target=lambda: other.append(preprocessor([_image(300, 200)])))
+    thread.start()
+    thread.join()
+    assert not np.shares_memory(main, other[0])
+
+
+def test_preprocess_returns_an_owned_copy():
+    image = _image(320, 240)
+    first = preprocess(image)
+    assert first.shape == (3, 224, 224) and first.base is None
+    np.testing.assert_array_equal(first, preprocess(image))
+
+
+CONVNEXT_STYLE = types.SimpleNamespace(  # microsoft/resnet-50
+    size={"shortest_edge": 224}, crop_pct=0.875, resample=3,
+    image_mean=[0.485, 0.456, 0.406], image_std=[0.229, 0.224, 0.225],
+)
+MOBILENET_V2 = types.SimpleNamespace(  # google/mobilenet_v2_1.0_224
+    size={"shortest_edge": 256}, crop_size={"height": 224, "width": 224}, do_center_crop=True,
+    resample=2, image_mean=[0.5, 0.5, 0.5], image_std=[0.5, 0.5, 0.5],
+)
+
+
+@pytest.mark.parametrize("processor, expected", [
+    (CONVNEXT_STYLE, {"size": 224, "crop_pct": 0.875, "resample": 3,
+                      "image_mean": [0.485, 0.456, 0.406], "image_std": [0.229, 0.224, 0.225]}),
+    (MOBILENET_V2, {"size": 224, "crop_pct": 0.875, "resample": 2,
+                    "image_mean": [0.5, 0.5, 0.5], "image_std": [0.5, 0.5, 0.5]}),
+])
+def test_config_from_processor(processor, expected):
+    config = config_from_processor(processor)
+    assert config == expected
+    # Shortest edge is resized to size / crop_pct, i.e. 256 for both
+    assert int(config["size"] / config["crop_pct"]) == 256
+
+
+def _hf_processors():
+    transformers = pytest.importorskip("transformers")
+    return [
+        transformers.ConvNextImageProcessor(size={"shortest_edge": 224}, crop_pct=0.875, resample=3),
+        transformers.MobileNetV2ImageProcessor(
+            size={"shortest_edge": 256}, crop_size={"height": 224, "width": 224}, resample=2,
+            image_mean=[0.5, 0.5, 0.5], image_std=[0.5, 0.5, 0.5],
+        ),
+    ]
+
+
+@pytest.mark.parametrize("which", [0, 1], ids=["convnext", "mobilenet_v2"])
+def test_matches_the_huggingface_processor(which):
+    processor = _hf_processors()[which]
+    preprocessor = BatchPreprocessor(**config_from_processor(processor))
+    images = [_image(320, 240, seed=1), _image(200, 300, seed=2), _image(640, 480, seed=3)]
+    expected = processor(images=images, return_tensors="np")["pixel_values"]
+    actual = preprocessor(images)
+    assert actual.shape == expected.shape
+    assert np.abs(actual - expected).max() < 1e-4
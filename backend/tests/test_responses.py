@@ -0,0 +1,51 @@
+import gzip
+from datetime import datetime
+
+import pytest
+from flask import jsonify
+
+from app.responses import init_responses, rows_payload
+
+ROWS = [{"id": 1, "category": "plastic"}, {"id": 2, "category": "glass"}]
+
+
+@pytest.fixture
+def client(app):
+    init_responses(app)
+
+    @app.route("/rows")
+    def rows():
+        return jsonify({"uploads": rows_payload(ROWS * 200), "at": datetime(2024, 1, 31, 12)})
+
+    @app.route("/small")
+    def small():
+        return jsonify({"ok": True})
+
+    return app.test_client()
+
+
+def test_rows_payload_default_and_columns(app):
+    with app.test_request_context("/"):
+        assert rows_payload(ROWS) is ROWS
+    with app.test_request_context("/?shape=columns"):
+        assert rows_payload(ROWS) == {"columns": ["id", "category"], "rows": [[1, "plastic"], [2, "glass"]]}
+        assert rows_payload([]) == {"columns": [], "rows": []}
+
+
+def test_large_json_is_gzipped_when_accepted(client):
+    response = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert b'"2024-01-31T12:00:00' in gzip.decompress(response.data)
+
+
+def test_refused_encoding_and_small_bodies_stay_plain(client):
+    assert "Content-Encoding" not in client.get("/rows", headers={"Accept-Encoding": "gzip;q=0"}).headers
+    assert "Content-Encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_brotli_preferred_when_available(client):
+    brotli = pytest.importorskip("brotli")
+    response = client.get("/rows", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(response.data).startswith(b"{")
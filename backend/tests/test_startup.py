@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from app.config import Config
+from app.profiling import BACKEND_DIR, MODEL_MODULES, _parse_importtime, profile_startup
+
+IMPORTTIME_STDERR = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        420 | io
+import time:       200 |        200 |     flask.globals
+import time:       500 |        700 |   flask.app
+import time:      1000 |       1700 | flask
+import time:        50 |         50 |   app.config
+import time:       400 |        450 | app
+import time:       800 |        800 | app.health
+some unrelated warning | with | pipes
+"""
+
+
+def test_parse_importtime_counts_only_outermost_imports():
+    assert _parse_importtime(IMPORTTIME_STDERR) == {"io": 420, "flask": 1700, "app": 1250}
+
+
+@pytest.mark.skipif(not os.path.isdir(os.path.join(BACKEND_DIR, "app", "models")),
+                    reason="boots the real app, which needs the models package")
+def test_boot_is_within_budget_and_does_not_load_the_model():
+    report = profile_startup(trace_memory=False)
+    boot_s = report["import_app_s"] + report["create_app_s"]
+    assert boot_s <= Config.STARTUP_BUDGET_SECONDS, f"boot took {boot_s:.2f}s"
+    assert not [m for m in MODEL_MODULES if m in report["loaded"]]
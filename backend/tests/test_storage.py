@@ -0,0 +1,158 @@
+import hashlib
+import io
+import os
+import shutil
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.storage import ReadThroughCache, S3Storage, UploadStorage
+
+ClientError = pytest.importorskip("botocore.exceptions").ClientError
+
+
+class FakeS3Client:
+    """In-memory stand-in for the four boto3 S3 calls the storage layer makes."""
+
+    def __init__(self):
+        self.objects = {}  # (bucket, key) -> (bytes, extra args)
+        self.uploads = 0
+        self.downloads = 0
+
+    @staticmethod
+    def _error(code):
+        return ClientError({"Error": {"Code": code}}, "S3")
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise self._error("404")
+        return {"ContentLength": len(self.objects[Bucket, Key][0])}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None):
+        with open(Filename, "rb") as fh:
+            self.objects[Bucket, Key] = (fh.read(), ExtraArgs or {})
+        self.uploads += 1
+
+    def download_file(self, Bucket, Key, Filename):
+        if (Bucket, Key) not in self.objects:
+            raise self._error("404")
+        with open(Filename, "wb") as fh:
+            fh.write(self.objects[Bucket, Key][0])
+        self.downloads += 1
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+def _key(content):
+    return f"{hashlib.sha256(content).hexdigest()}.jpg"
+
+
+def _src(tmp_path, content):
+    path = tmp_path / f"src-{hashlib.sha256(content).hexdigest()[:8]}"
+    path.write_bytes(content)
+    return str(path)
+
+
+@pytest.fixture
+def s3():
+    return FakeS3Client()
+
+
+@pytest.fixture
+def remote(s3):
+    return S3Storage("bucket", prefix="/uploads/", client=s3)
+
+
+def test_put_file_uploads_once_under_sharded_key(remote, s3, tmp_path):
+    key = _key(b"abc")
+    remote.put_file(_src(tmp_path, b"abc"), key)
+    remote.put_file(_src(tmp_path, b"abc"), key)  # content addressed: already there
+    body, extra = s3.objects["bucket", f"uploads/{key[0:2]}/{key[2:4]}/{key}"]
+    assert body == b"abc" and s3.uploads == 1
+    assert extra["ContentType"] == "image/jpeg" and "immutable" in extra["CacheControl"]
+
+
+def test_exists_and_download(remote, tmp_path):
+    key = _key(b"abc")
+    assert not remote.exists(key)
+    with pytest.raises(FileNotFoundError):
+        remote.download(key, str(tmp_path / "out"))
+    remote.put_file(_src(tmp_path, b"abc"), key)
+    assert remote.exists(key)
+    remote.download(key, str(tmp_path / "out"))
+    assert (tmp_path / "out").read_bytes() == b"abc"
+
+
+def test_other_client_errors_propagate(remote, s3):
+    def forbidden(**kwargs):
+        raise s3._error("403")
+
+    s3.head_object = forbidden
+    with pytest.raises(ClientError):
+        remote.exists(_key(b"abc"))
+
+
+def test_cache_is_sized_lazily_on_first_write(remote, tmp_path):
+    cache_dir = tmp_path / "cache"
+    ReadThroughCache(remote, str(cache_dir), 1000).put_file(_src(tmp_path, b"x" * 100), _key(b"x" * 100))
+    cache = ReadThroughCache(remote, str(cache_dir), 1000)
+    assert cache._bytes is None  # no directory walk at startup
+    cache.put_file(_src(tmp_path, b"y" * 50), _key(b"y" * 50))
+    assert cache._bytes == 150
+
+
+def test_cache_reads_through_and_refetches_evicted_files(remote, s3, tmp_path):
+    cache = ReadThroughCache(remote, str(tmp_path / "cache"), 1000)
+    key = _key(b"abc")
+    cache.put_file(_src(tmp_path, b"abc"), key)
+    path = cache.local_path(key)
+    assert open(path, "rb").read() == b"abc" and s3.downloads == 0
+    os.remove(path)
+    assert open(cache.local_path(key), "rb").read() == b"abc" and s3.downloads == 1
+    with pytest.raises(FileNotFoundError):
+        cache.local_path(_key(b"missing"))
+
+
+def test_eviction_drops_least_recently_read(remote, tmp_path):
+    cache = ReadThroughCache(remote, str(tmp_path / "cache"), 250)
+    keys = [_key(bytes([n]) * 100) for n in range(3)]
+    for n, key in enumerate(keys[:2]):
+        cache.put_file(_src(tmp_path, bytes([n]) * 100), key)
+        os.utime(cache.disk.path(key), (1000 + n, 1000))
+    os.utime(cache.disk.path(keys[0]), (2000, 1000))  # read most recently
+    cache.put_file(_src(tmp_path, bytes([2]) * 100), keys[2])
+
+    assert [cache.disk.exists(key) for key in keys] == [True, False, True]
+    assert cache._bytes == 200
+    assert remote.exists(keys[1])  # only the local copy goes
+
+
+@pytest.fixture
+def upload_storage(app, s3, tmp_path):
+    app.config.update(
+        UPLOAD_STORAGE="s3",
+        S3_BUCKET="bucket",
+        UPLOAD_CACHE_DIR=str(tmp_path / "cache"),
+        UPLOAD_CACHE_MAX_BYTES=10_000,
+    )
+    upload_storage = UploadStorage()
+    upload_storage.init_app(app, s3_client=s3)
+    return upload_storage
+
+
+def test_injected_client_serves_ranges_and_conditional_requests(app, upload_storage, s3, tmp_path):
+    staged = upload_storage.stage(FileStorage(io.BytesIO(b"0123456789"), "a.jpg"), "JPG")
+    upload_storage.commit(staged)
+    assert staged.key == _key(b"0123456789") and s3.uploads == 1
+    shutil.rmtree(tmp_path / "cache" / staged.key[0:2])  # served from S3 through the cache
+
+    with app.test_request_context(headers={"Range": "bytes=2-4"}):
+        response = upload_storage.send(staged.key)
+        response.direct_passthrough = False
+        assert response.status_code == 206 and response.get_data() == b"234"
+        assert response.cache_control.immutable
+        etag = response.headers["ETag"]
+    with app.test_request_context(headers={"If-None-Match": etag}):
+        assert upload_storage.send(staged.key).status_code == 304
+    assert s3.downloads == 1